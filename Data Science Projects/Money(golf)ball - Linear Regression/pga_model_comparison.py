@@ -0,0 +1,173 @@
+"""This module compares regression models for PGA tour earnings with K-fold
+cross validation.
+
+Every model is an sklearn Pipeline. Folds are run in parallel across a process
+pool and, within a fold, preprocessing steps shared by several pipelines (for
+example scaling or PolynomialFeatures) are fit and applied once and reused by
+every model that starts with the same steps.
+
+The output of this module is a tidy DataFrame with one row per model and fold
+holding the train and validation scores and timings.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import time
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import TransformedTargetRegressor
+from sklearn.linear_model import LinearRegression, Lasso
+from sklearn.metrics import r2_score, mean_absolute_error
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler, PolynomialFeatures
+
+# Feature columns of pga_stats_final.pkl in order, without player and earnings
+FEATURES = ['scoring_avg', 'driving_dist', 'driving_acc', 'gir_fairway', 'gir_other',
+            'sg_tee_to_green', 'sg_total', 'sg_putting', 'scrambling', '3_putt_avoid',
+            'putts_per_round', 'prox_to_hole', 'bogey_avoidance']
+
+def log_features(X):
+    """Returns the features with the columns added for the log feature model
+    in pga_eda_and_modeling.ipynb: scoring_avg squared and the logs of
+    3_putt_avoid and prox_to_hole.
+
+    Parameters
+    ----------
+    X : <array> The features, with columns in the order of FEATURES.
+
+    """
+    X = np.asarray(X, dtype=float)
+    added = [X[:, FEATURES.index('scoring_avg')] ** 2,
+             np.log(X[:, FEATURES.index('3_putt_avoid')]),
+             np.log(X[:, FEATURES.index('prox_to_hole')])]
+    return np.column_stack([X] + added)
+
+def default_pipelines():
+    """Returns the models compared in pga_eda_and_modeling.ipynb as a list of
+    (name, Pipeline) tuples.
+
+    The log feature model fits log earnings, as in the notebook, but predicts
+    earnings in dollars so its scores are comparable with the other models."""
+
+    return [('linear', Pipeline([('lm', LinearRegression())])),
+            ('log_features', Pipeline([('log', FunctionTransformer(log_features)),
+                                       ('lm', TransformedTargetRegressor(LinearRegression(),
+                                                                         func=np.log,
+                                                                         inverse_func=np.exp))])),
+            ('poly', Pipeline([('poly', PolynomialFeatures(degree=2)),
+                               ('lm', LinearRegression())])),
+            ('poly_lasso', Pipeline([('poly', PolynomialFeatures(degree=2)),
+                                     ('std', StandardScaler()),
+                                     ('lasso', Lasso(alpha=35038))]))]
+
+def step_key(step):
+    """Returns a hashable key identifying a preprocessing step and its
+    parameters, used to share fitted steps between pipelines."""
+
+    return type(step).__name__, repr(sorted(step.get_params(deep=False).items()))
+
+def preprocess(steps, X_train, y_train, X_val, cache):
+    """Applies a list of preprocessing steps to a fold, reusing the output of
+    any prefix of the steps already stored in cache.
+
+    Parameters
+    ----------
+    steps : <list> A list of unfitted sklearn transformers.
+    X_train, y_train : <array> The training data of the fold.
+    X_val : <array> The validation features of the fold.
+    cache : <dict> Transformed (X_train, X_val) pairs keyed by step prefix.
+
+    Returns
+    -------
+    X_train, X_val : <array> The transformed training and validation features.
+
+    """
+    key = ()
+    for step in steps:
+        key += (step_key(step),)
+        if key not in cache:
+            transformer = clone(step)
+            cache[key] = transformer.fit_transform(X_train, y_train), transformer.transform(X_val)
+        X_train, X_val = cache[key]
+    return X_train, X_val
+
+def run_fold(pipelines, X, y, fold, train_idx, val_idx):
+    """Fits and scores every pipeline on a single fold.
+
+    Returns
+    -------
+    rows : <list> A list of dictionaries, one per pipeline.
+
+    """
+    X_train, y_train = X[train_idx], y[train_idx]
+    X_val, y_val = X[val_idx], y[val_idx]
+    cache = {}
+    rows = []
+
+    for name, pipeline in pipelines:
+        start = time.perf_counter()
+        X_train_t, X_val_t = preprocess([step for _, step in pipeline.steps[:-1]],
+                                        X_train, y_train, X_val, cache)
+        preprocess_time = time.perf_counter() - start
+
+        estimator = clone(pipeline.steps[-1][1])
+        start = time.perf_counter()
+        estimator.fit(X_train_t, y_train)
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        train_pred, val_pred = estimator.predict(X_train_t), estimator.predict(X_val_t)
+        score_time = time.perf_counter() - start
+
+        rows.append({'model': name, 'fold': fold,
+                     'train_r2': r2_score(y_train, train_pred),
+                     'val_r2': r2_score(y_val, val_pred),
+                     'val_mae': mean_absolute_error(y_val, val_pred),
+                     'preprocess_time': preprocess_time,
+                     'fit_time': fit_time,
+                     'score_time': score_time})
+    return rows
+
+def compare_models(pipelines, X, y, folds=5, n_jobs=None, random_state=None):
+    """Cross validates a list of pipelines on the same folds.
+
+    Parameters
+    ----------
+    pipelines : <list> A list of (name, Pipeline) tuples.
+    X : <array> The features, a DataFrame or array.
+    y : <array> The target, a Series or array.
+    folds : <int> or <splitter> The number of shuffled KFold splits or an sklearn
+    cross validation splitter such as KFold(n_splits=5, shuffle=True).
+    n_jobs : <int> The number of worker processes, defaults to the number of
+    CPUs. Use 1 to run the folds in the current process.
+    random_state : <int> Seed for the shuffled folds when folds is an int.
+
+    Returns
+    -------
+    results : <DataFrame> A DataFrame with one row per model and fold.
+
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    if isinstance(folds, int):
+        folds = KFold(n_splits=folds, shuffle=True, random_state=random_state)
+    splits = list(folds.split(X, y))
+
+    if n_jobs == 1:
+        fold_rows = [run_fold(pipelines, X, y, fold, train_idx, val_idx)
+                     for fold, (train_idx, val_idx) in enumerate(splits)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(run_fold, pipelines, X, y, fold, train_idx, val_idx)
+                       for fold, (train_idx, val_idx) in enumerate(splits)]
+            fold_rows = [future.result() for future in futures]
+
+    return pd.DataFrame([row for rows in fold_rows for row in rows])
+
+def summarize(results):
+    """Returns the mean and standard deviation of each score and timing per
+    model from the output of compare_models()."""
+
+    summary = results.drop(columns='fold').groupby('model', sort=False).agg(['mean', 'std'])
+    return summary.sort_values(('val_r2', 'mean'), ascending=False)
@@ -0,0 +1,64 @@
+"""This script measures how fast cached PGA tour stat pages are parsed.
+
+It times the lxml table parser in pga_stats_parser.py against the original
+BeautifulSoup traversal over every stat page already in the html cache and
+prints the throughput of each in pages and megabytes per second.
+
+"""
+
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+from pga_stats_scraper import CACHE_DIR, cache_path, fetch_page, get_links, stats
+from pga_stats_parser import parse_stat_table
+
+def cached_pages(years, cache_dir=CACHE_DIR):
+    """Returns a list of (stat, year, html) tuples for every cached stat page."""
+
+    pages = []
+    for year in years:
+        for stat, url in zip(stats, get_links(stats, year)):
+            if os.path.exists(cache_path(url, cache_dir)):
+                pages.append((stat, year, fetch_page(url, cache_dir=cache_dir)))
+    return pages
+
+def parse_with_soup(page, stat, year):
+    """Parses a stat page the way get_stats() did with BeautifulSoup."""
+
+    soup = BeautifulSoup(page, 'lxml')
+    find_players = soup.find(class_='details-table-wrap').find_all('td', class_='player-name')
+    find_stats = soup.find(class_='details-table-wrap').find_all('td', class_='')
+    players = [player.text.replace('\n', '') for player in find_players]
+    values = [num.text for i, num in enumerate(find_stats) if i % 2 != 0]
+    return dict(zip(players, values))
+
+def time_parser(parser, pages, repeat=3):
+    """Returns the best wall time in seconds to parse all pages with a parser."""
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for stat, year, page in pages:
+            parser(page, stat, year)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(years):
+    """Prints the parse throughput of each parser over the cached pages."""
+
+    pages = cached_pages(years)
+    if not pages:
+        print('No cached pages found in {}, run the scraper first.'.format(CACHE_DIR))
+        return
+
+    megabytes = sum(len(page.encode('utf-8')) for _, _, page in pages) / 1e6
+    print('{} cached pages, {:.1f} MB'.format(len(pages), megabytes))
+    for name, parser in [('BeautifulSoup', parse_with_soup), ('lxml', parse_stat_table)]:
+        seconds = time_parser(parser, pages)
+        print('{:>13}: {:.3f} s, {:.1f} pages/s, {:.1f} MB/s'.format(
+            name, seconds, len(pages) / seconds, megabytes / seconds))
+
+if __name__ == '__main__':
+    first, last = (int(arg) for arg in sys.argv[1:3]) if len(sys.argv) > 2 else (2015, 2019)
+    main(range(first, last + 1))
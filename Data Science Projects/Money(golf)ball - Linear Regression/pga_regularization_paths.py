@@ -0,0 +1,154 @@
+"""This module sweeps ridge and lasso regularization strengths for the PGA
+tour earnings regression.
+
+Instead of refitting Ridge or Lasso from scratch for every alpha, each fold
+builds its standardized polynomial design once. Ridge coefficients for every
+alpha are then computed in closed form from a single SVD of that design, and
+lasso uses sklearn's lasso_path, where each alpha's coordinate descent is
+warm-started from the previous solution.
+
+The output of this module is a tidy DataFrame with the train and validation
+R^2 for every alpha and fold, matching the scores printed by the CV loops in
+pga_eda_and_modeling.ipynb.
+
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import lasso_path as sklearn_lasso_path
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import PolynomialFeatures
+
+def fold_design(X_train, X_val, degree=2):
+    """Expands a fold's features with PolynomialFeatures and standardizes them
+    using the training set mean and standard deviation.
+
+    Parameters
+    ----------
+    X_train : <array> The training features of the fold.
+    X_val : <array> The validation features of the fold.
+    degree : <int> The degree of the polynomial features, 1 for none.
+
+    Returns
+    -------
+    X_train, X_val : <array> The standardized designs.
+
+    """
+    if degree > 1:
+        poly = PolynomialFeatures(degree=degree, include_bias=False)
+        X_train, X_val = poly.fit_transform(X_train), poly.transform(X_val)
+
+    mean, scale = X_train.mean(axis=0), X_train.std(axis=0)
+    scale[scale == 0] = 1.0
+    return (X_train - mean) / scale, (X_val - mean) / scale
+
+def ridge_path(X_train, y_train, X_val, alphas):
+    """Fits ridge regression for every alpha from one SVD of the design.
+
+    The design is expected to be standardized, the intercept is the mean of
+    y_train as in Ridge(fit_intercept=True).
+
+    Parameters
+    ----------
+    X_train, y_train : <array> The standardized training data.
+    X_val : <array> The standardized validation features.
+    alphas : <array> The regularization strengths.
+
+    Returns
+    -------
+    coefs : <array> The coefficients, shape (n_features, n_alphas).
+    train_pred, val_pred : <array> Predictions for every alpha, shape
+    (n_samples, n_alphas).
+
+    """
+    y_mean = y_train.mean()
+    U, s, Vt = np.linalg.svd(X_train - X_train.mean(axis=0), full_matrices=False)
+    Uty = U.T @ (y_train - y_mean)
+
+    # Shrinkage factors s / (s^2 + alpha) for every singular value and alpha
+    d = s[:, None] / (s[:, None] ** 2 + np.asarray(alphas)[None, :])
+    coefs = Vt.T @ (d * Uty[:, None])
+    train_pred = U @ ((s[:, None] * d) * Uty[:, None]) + y_mean
+    val_pred = (X_val - X_train.mean(axis=0)) @ coefs + y_mean
+    return coefs, train_pred, val_pred
+
+def lasso_path(X_train, y_train, X_val, alphas, **kwargs):
+    """Fits lasso for every alpha with warm-started coordinate descent.
+
+    Parameters
+    ----------
+    X_train, y_train : <array> The standardized training data.
+    X_val : <array> The standardized validation features.
+    alphas : <array> The regularization strengths in decreasing order.
+    kwargs : Additional arguments for sklearn.linear_model.lasso_path.
+
+    Returns
+    -------
+    coefs : <array> The coefficients, shape (n_features, n_alphas).
+    train_pred, val_pred : <array> Predictions for every alpha, shape
+    (n_samples, n_alphas).
+
+    """
+    X_mean, y_mean = X_train.mean(axis=0), y_train.mean()
+    X_centered = X_train - X_mean
+    _, coefs, _ = sklearn_lasso_path(X_centered, y_train - y_mean, alphas=alphas, **kwargs)
+    train_pred = X_centered @ coefs + y_mean
+    val_pred = (X_val - X_mean) @ coefs + y_mean
+    return coefs, train_pred, val_pred
+
+def r2_scores(y, preds):
+    """Returns the R^2 of every column of preds against y."""
+
+    ss_res = ((y[:, None] - preds) ** 2).sum(axis=0)
+    ss_tot = ((y - y.mean()) ** 2).sum()
+    return 1 - ss_res / ss_tot
+
+def cv_path(X, y, alphas, model='ridge', folds=5, degree=2, random_state=None):
+    """Cross validates ridge or lasso over a grid of alphas.
+
+    Parameters
+    ----------
+    X : <array> The features, a DataFrame or array.
+    y : <array> The target, a Series or array.
+    alphas : <array> The regularization strengths to sweep.
+    model : <str> Either 'ridge' or 'lasso'.
+    folds : <int> or <splitter> The number of shuffled KFold splits or an sklearn
+    cross validation splitter.
+    degree : <int> The degree of the polynomial features.
+    random_state : <int> Seed for the shuffled folds when folds is an int.
+
+    Returns
+    -------
+    results : <DataFrame> A DataFrame with alpha, fold, train_r2, val_r2 and
+    n_nonzero columns.
+
+    Raises
+    ------
+    ValueError : The model is not 'ridge' or 'lasso'.
+
+    """
+    paths = {'ridge': ridge_path, 'lasso': lasso_path}
+    if model not in paths:
+        raise ValueError('Invalid model {}, expected one of {}'.format(model, list(paths)))
+
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    alphas = np.sort(np.asarray(alphas, dtype=float))[::-1]
+    if isinstance(folds, int):
+        folds = KFold(n_splits=folds, shuffle=True, random_state=random_state)
+
+    frames = []
+    for fold, (train_idx, val_idx) in enumerate(folds.split(X, y)):
+        X_train, X_val = fold_design(X[train_idx], X[val_idx], degree)
+        coefs, train_pred, val_pred = paths[model](X_train, y[train_idx], X_val, alphas)
+        frames.append(pd.DataFrame({'alpha': alphas, 'fold': fold,
+                                    'train_r2': r2_scores(y[train_idx], train_pred),
+                                    'val_r2': r2_scores(y[val_idx], val_pred),
+                                    'n_nonzero': (np.abs(coefs) > 0).sum(axis=0)}))
+    return pd.concat(frames, ignore_index=True)
+
+def best_alpha(results):
+    """Returns the alpha with the highest mean validation R^2 and a DataFrame
+    of the mean and standard deviation of each score per alpha."""
+
+    summary = results.drop(columns='fold').groupby('alpha').agg(['mean', 'std'])
+    return summary[('val_r2', 'mean')].idxmax(), summary
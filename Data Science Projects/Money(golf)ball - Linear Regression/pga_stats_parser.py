@@ -0,0 +1,129 @@
+"""This module parses stat pages from the PGA tour website.
+
+Each stat page holds one table inside a 'details-table-wrap' div. The table is
+parsed in a single pass with lxml and the stat column is selected by its header
+name, so a change in the column layout raises an error instead of silently
+shifting values.
+
+The output of this module is a long-format DataFrame with one row per player,
+year and stat that can be pivoted or stored for further analysis. Every row
+carries the player's PGA tour ID, taken from the link to their profile, so
+rows can be joined on the player rather than on the display name.
+
+"""
+
+import re
+import unicodedata
+import lxml.html
+import pandas as pd
+
+stat_headers = {'120': 'AVG', '101': 'AVG.', '102': '%', '190': '%', '199': '%',
+                '02674': 'AVERAGE', '02675': 'AVERAGE', '02564': 'AVERAGE',
+                '130': '%', '426': '%', '119': 'AVG', '331': 'AVG',
+                '02414': 'AVG', '109': 'MONEY'}
+"""dict: Header of the value column on the stat page for each stat number."""
+
+PLAYER_HEADER = 'PLAYER NAME'
+"""str: Header of the player name column on every stat page."""
+
+PLAYER_ID_PATTERN = re.compile(r'player\.(\d+)')
+"""Pattern: Matches the player ID in a player profile link, e.g. player.28237.rory-mcilroy.html."""
+
+def normalize_header(header):
+    """Normalizes a column header so minor formatting changes still match."""
+
+    return ' '.join(header.split()).upper().rstrip('.')
+
+def normalize_name(name):
+    """Normalizes a player name so the same player matches across pages.
+
+    Accents, punctuation, case and repeated whitespace are removed and runs of
+    initials are joined, so 'Fabián Gómez' matches 'Fabian  Gomez' and 'C.T.
+    Pan' matches 'C. T. Pan'.
+
+    Parameters
+    ----------
+    name : <str> A player name.
+
+    Returns
+    -------
+    <str> The normalized name.
+
+    """
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower().replace("'", '')).split())
+
+    # Join runs of initials so 'c t pan' and 'ct pan' match
+    return re.sub(r'\b([a-z]) (?=[a-z]\b)', r'\1', name)
+
+def to_numeric(values):
+    """Converts a column of stat strings to floats in one vectorized pass.
+
+    Dollar signs, commas and percent signs are stripped and distances in the
+    form 7' 2" are converted to inches. Values that cannot be parsed are NaN.
+
+    Parameters
+    ----------
+    values : <Series> A Series of stat strings.
+
+    Returns
+    -------
+    <Series> A float Series of the parsed values.
+
+    """
+    values = values.astype(str).str.strip()
+    feet_inches = values.str.extract(r"^(\d+)'\s*(\d+(?:\.\d+)?)\"?$").astype(float)
+    inches = feet_inches[0] * 12 + feet_inches[1]
+    numbers = pd.to_numeric(values.str.replace(r'[$,%]', '', regex=True), errors='coerce')
+    return numbers.where(inches.isna(), inches)
+
+def parse_stat_table(page, stat, year, name=None):
+    """Parses the stat table of a PGA tour stat page into a long-format
+    DataFrame.
+
+    Parameters
+    ----------
+    page : <str> The html of a stat page.
+    stat : <str> The stat number of the page.
+    year : <int> The year of the page.
+    name : <str> The column name to give the stat, defaults to the stat number.
+
+    Returns
+    -------
+    df : <DataFrame> A DataFrame with player_id, player, year, stat and value
+    columns. player_id is None for players without a profile link.
+
+    Raises
+    ------
+    ValueError : The page has no stat table or the table is missing the
+    player or stat column.
+
+    """
+    tables = lxml.html.fromstring(page).xpath(
+        '//div[contains(concat(" ", normalize-space(@class), " "), " details-table-wrap ")]//table')
+    if not tables:
+        raise ValueError('No stats table found for stat {} in {}'.format(stat, year))
+    table = tables[0]
+
+    headers = [normalize_header(th.text_content()) for th in table.xpath('.//thead//th')]
+    value_header = normalize_header(stat_headers.get(stat, 'AVG'))
+    if PLAYER_HEADER not in headers or value_header not in headers:
+        raise ValueError('Stat {} in {} is missing a {} or {} column, found {}'.format(
+            stat, year, PLAYER_HEADER, value_header, headers))
+    player_idx, value_idx = headers.index(PLAYER_HEADER), headers.index(value_header)
+
+    player_ids, players, values = [], [], []
+    for row in table.xpath('.//tbody/tr'):
+        cells = row.xpath('./td')
+        if len(cells) > max(player_idx, value_idx):
+            match = PLAYER_ID_PATTERN.search(' '.join(cells[player_idx].xpath('.//a/@href')))
+            player_ids.append(match.group(1) if match else None)
+            players.append(cells[player_idx].text_content().strip())
+            values.append(cells[value_idx].text_content().strip())
+
+    df = pd.DataFrame({'player_id': player_ids, 'player': players, 'value': values})
+    df['year'] = year
+    df['stat'] = name or stat
+    df['value'] = to_numeric(df['value'])
+    return df[['player_id', 'player', 'year', 'stat', 'value']]
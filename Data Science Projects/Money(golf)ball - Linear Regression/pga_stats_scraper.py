@@ -4,14 +4,22 @@ The module gathers the statistics for each player who has this information
 recorded over a range of calendar years that is specified.
 
 The output of this module is a DataFrame that can be used for further analysis.
+Nothing is fetched when the module is imported. Data is scraped on demand by 
+load_seasons() and the season DataFrames df2015 ... df2019 are built the first 
+time they are accessed.
 
 """
 
 # List of stat numbers in URL headers
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from pga_stats_parser import normalize_name, parse_stat_table
 
 stats = ['120', '101', '102', '190', '199', '02674', '02675', '02564', 
          '130', '426', '119', '331', '02414', '109']
@@ -23,6 +31,106 @@ cols = ['scoring_avg', 'driving_dist', 'driving_acc',
         'earnings']
 """list: List of stat names that correspond to the stat numbers."""
 
+CACHE_DIR = 'html_cache'
+"""str: Directory where raw stat pages are cached, one file per url."""
+
+ROSTER_STAT = '109'
+"""str: Stat whose page lists the players kept for a season, the money list."""
+
+MAX_WORKERS = 4
+"""int: Maximum number of concurrent requests made to the PGA tour website."""
+
+_parsed = {}
+"""dict: Parsed stat tables memoized by (stat, year)."""
+
+def get_session(max_workers=MAX_WORKERS):
+    """Returns a requests Session with a connection pool sized to the number
+    of workers so connections are reused across stat pages.
+    
+    Parameters
+    ----------
+    max_workers : <int> The number of threads that will share the session.
+
+    Returns
+    -------
+    session : <Session> A pooled requests Session.
+
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, 
+                          max_retries=3)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def cache_path(url, cache_dir=CACHE_DIR):
+    """Returns the file path a url's raw html is cached under."""
+    
+    return os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html')
+
+def fetch_page(url, session=None, cache_dir=CACHE_DIR):
+    """Returns the raw html of a url, reading it from the on-disk cache when
+    it has already been downloaded and writing it to the cache otherwise.
+    
+    Parameters
+    ----------
+    url : <str> A url in the form of a string.
+    session : <Session> An optional requests Session to fetch the url with.
+    cache_dir : <str> The directory holding cached pages.
+
+    Returns
+    -------
+    page : <str> The html text of the url.
+
+    """
+    path = cache_path(url, cache_dir)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    
+    response = (session or requests).get(url)
+    response.raise_for_status()
+    page = response.text
+    
+    # Write to a temp file first so an interrupted run never leaves a partial page
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(path + '.tmp', path)
+    return page
+
+def fetch_pages(urls, max_workers=MAX_WORKERS, cache_dir=CACHE_DIR):
+    """Fetches a list of urls concurrently over one pooled session. Only urls
+    missing from the cache are requested from the website.
+    
+    Parameters
+    ----------
+    urls : <list> A list of url strings.
+    max_workers : <int> The maximum number of concurrent requests.
+    cache_dir : <str> The directory holding cached pages.
+
+    Returns
+    -------
+    pages : <dict> A dictionary with urls as keys and their html as values.
+
+    """
+    pages = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        if os.path.exists(cache_path(url, cache_dir)):
+            pages[url] = fetch_page(url, cache_dir=cache_dir)
+        else:
+            missing.append(url)
+    
+    if missing:
+        session = get_session(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = executor.map(lambda url: fetch_page(url, session, cache_dir), missing)
+            pages.update(zip(missing, fetched))
+        session.close()
+    
+    return pages
+
 def get_soup(url):
     """ Takes a url string and converts to a BeautifulSoup object.
     
@@ -35,8 +143,7 @@ def get_soup(url):
     soup : <soup> A BeautifulSoup object of the url input. 
 
     """
-    response = requests.get(url)
-    page = response.text
+    page = fetch_page(url)
     soup = BeautifulSoup(page, 'lxml')
     return soup
 
@@ -76,24 +183,11 @@ def get_players_on_money_list(year):
     <list> A list of player names.
     
     """
-    url = 'https://www.pgatour.com/stats/stat/jcr:content/mainParsys/details.109.y{}.scontent.html'.format(year)
-    soup = get_soup(url)
-    soup = get_soup(url)
-    find_players = soup.find(class_='details-table-wrap').find_all('td', class_='player-name')
-    return [item.text.replace('\n', '') for item in find_players]
-
-def add_nans_to_dict(d):
-    """Adds null values to a dictionary to ensure item lists are same length."""
-    
-    global cols
-    for k, v in d.items():
-        if len(v) != len(cols):
-            v.extend([None] * (len(cols)-len(v)))
-    return d
+    return load_seasons([year], [ROSTER_STAT])['player'].tolist()
 
 def get_stats(stats, year, player_list):
-    """This function returns a dictionary of players and their associated 
-    statistics for a given season of golf. 
+    """This function returns a long-format DataFrame of players and their 
+    associated statistics for a given season of golf. 
     
     Parameters
     ----------
@@ -103,52 +197,152 @@ def get_stats(stats, year, player_list):
 
     Returns
     -------
-    stats_dict <dict> A dictionary with player names as keys and their associated
-    stats in a list form as the values.
+    df <DataFrame> A DataFrame with one row per player and stat.
     
     Example: 
-        returns {'Tiger Woods': ['70', '302.0', '64.4', '68.7']}
+        returns   player       year  stat   value
+                  Tiger Woods  2019  120    70.0
+                  Tiger Woods  2019  101    302.0
     
-    Note that not all players will have a value for all stats, so the value lists
-    may not be the same length.
+    Note that not all players will have a value for all stats, so players 
+    may have fewer rows than there are stats.
     
     """
     
-    urls = get_links(stats, year)
-    stats_dict = {k:[] for k in player_list}
-    
-    for url in urls:
-        players_url, stats_url = [], []
-        soup = get_soup(url)
-        find_players = soup.find(class_='details-table-wrap').find_all('td', class_='player-name')
-        find_stats = soup.find(class_='details-table-wrap').find_all('td', class_='')
-    
-        for player in find_players:
-            players_url.append(player.text.replace('\n', ''))
-            
-        for i, num in enumerate(find_stats):
-            if i % 2 != 0:
-                stats_url.append(num.text)
-        
-        d = dict(zip(players_url, stats_url))
-        
-        for k, v in d.items():
-            if k in stats_dict:
-                stats_dict[k].append(v)
-                
-    return stats_dict
+    df = load_seasons([year], stats)
+    names = set(normalize_name(player) for player in player_list)
+    return df[df['player'].map(normalize_name).isin(names)]
+
+def player_keys(df):
+    """Returns the key every row of a long-format DataFrame is joined on.
+
+    The key is the player's PGA tour ID. Rows without an ID take the ID of
+    the only player with the same normalized name, and fall back to
+    'name:<normalized name>' when there is none.
+
+    Parameters
+    ----------
+    df : <DataFrame> A DataFrame with player_id and player columns.
+
+    Returns
+    -------
+    keys : <Series> A Series of player keys aligned with df.
+
+    """
+    names = df['player'].map(normalize_name)
+    ids = df['player_id'] if 'player_id' in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    # Only names that belong to exactly one ID are used to fill in missing IDs
+    known = pd.DataFrame({'name': names, 'id': ids}).dropna().drop_duplicates()
+    known = known[~known['name'].duplicated(keep=False)].set_index('name')['id']
+    ids = ids.fillna(names.map(known))
+    return ids.where(ids.notna(), 'name:' + names)
+
+def align_stats(df, stats=stats, names=None, roster=ROSTER_STAT):
+    """Assembles a long-format DataFrame of any number of seasons into a wide
+    table with one row per player and season and one column per stat.
+
+    Every value is keyed by (player key, year, stat) and placed with a single
+    unstack, so a player missing from one stat page leaves a NaN in that
+    cell only instead of shifting the values of other stats.
+
+    Parameters
+    ----------
+    df : <DataFrame> A long-format DataFrame from load_seasons().
+    stats : <list> The stat numbers to keep, in column order.
+    names : <dict> A mapping of stat numbers to column names, defaults to the
+    stat numbers.
+    roster : <str> Stat number whose players are kept for each season and
+    whose player names are shown, or None to keep every player on any page.
+
+    Returns
+    -------
+    df : <DataFrame> A DataFrame with player_key, player_id, player and year
+    columns and one column per stat.
+
+    """
+    df = df.assign(player_key=player_keys(df))
+    wide = (df.drop_duplicates(['player_key', 'year', 'stat'])
+              .set_index(['player_key', 'year', 'stat'])['value']
+              .unstack('stat'))
+    if roster is not None and roster in set(df['stat']):
+        on_roster = df.loc[df['stat'] == roster, ['player_key', 'year']].drop_duplicates()
+        wide = wide.loc[pd.MultiIndex.from_frame(on_roster)]
+    wide = wide.reindex(columns=list(stats)).rename(columns=names or {}).rename_axis(columns=None)
+
+    # Pages can spell a name differently, so the displayed name is the most
+    # recent one on the roster page when there is one
+    shown = df[df['stat'] == roster] if roster is not None and roster in set(df['stat']) else df
+    players = shown.sort_values('year', kind='stable').groupby('player_key')['player'].last()
+    ids = df.groupby('player_key')['player_id'].first()
+    wide = wide.reset_index().join(ids, on='player_key').join(players, on='player_key')
+    return wide[['player_key', 'player_id', 'player', 'year'] + list(wide.columns[2:-2])]
+
+def load_table(years, stats=stats, cols=cols):
+    """Returns the wide table of stats for a list of years, built in one pass
+    over every season.
+
+    Parameters
+    ----------
+    years : <list> A list of years to collect the stats on.
+    stats : <list> A list of stat numbers from the PGA tour website.
+    cols : <list> The column names of the stats.
+
+    Returns
+    -------
+    df <DataFrame> A DataFrame from align_stats() of the money list players
+    of every year.
+
+    """
+    return align_stats(load_seasons(years, sorted(set(stats) | {ROSTER_STAT})), stats, dict(zip(stats, cols)))
 
 def create_df(stats, year, players, cols):
-    """This function creates a dataframe from a dictionary of player stats."""
-    
-    df = get_stats(stats, year, players)
-    df = add_nans_to_dict(df)
-    df = pd.DataFrame(df).T
-    df.columns = cols
-    return df
-
-df2019 = create_df(stats, 2019, get_players_on_money_list(2019), cols).reset_index()
-df2018 = create_df(stats, 2018, get_players_on_money_list(2018), cols).reset_index()
-df2017 = create_df(stats, 2017, get_players_on_money_list(2017), cols).reset_index()
-df2016 = create_df(stats, 2016, get_players_on_money_list(2016), cols).reset_index()
-df2015 = create_df(stats, 2015, get_players_on_money_list(2015), cols).reset_index()
+    """This function creates a dataframe of player stats with one row per
+    player and one column per stat. Players are matched on their normalized
+    names."""
+    
+    df = load_table([year], stats, cols)
+    names = set(normalize_name(player) for player in players)
+    df = df[df['player'].map(normalize_name).isin(names)]
+    return df.set_index('player')[cols].rename_axis(index=None)
+
+def load_seasons(years, stats=stats):
+    """Returns the stats for a list of years as a long-format DataFrame.
+    
+    Pages are only fetched the first time a (stat, year) pair is requested. 
+    Any pages that are missing are fetched in one concurrent batch and the 
+    parsed tables are memoized, so repeated calls return instantly.
+    
+    Parameters
+    ----------
+    years : <list> A list of years to collect the stats on.
+    stats : <list> A list of stat numbers from the PGA tour website.
+
+    Returns
+    -------
+    df <DataFrame> A DataFrame with player_id, player, year, stat and value
+    columns, empty when there are no years or stats.
+    
+    """
+    missing = [(stat, year) for year in years for stat in stats if (stat, year) not in _parsed]
+    if missing:
+        urls = [get_links([stat], year)[0] for stat, year in missing]
+        pages = fetch_pages(urls)
+        for (stat, year), url in zip(missing, urls):
+            _parsed[(stat, year)] = parse_stat_table(pages[url], stat, year)
+    
+    frames = [_parsed[(stat, year)] for year in years for stat in stats]
+    if not frames:
+        return pd.DataFrame(columns=['player_id', 'player', 'year', 'stat', 'value'])
+    return pd.concat(frames, ignore_index=True)
+
+def __getattr__(name):
+    """Builds the season DataFrames df2015 ... df2019 the first time they are
+    accessed rather than when the module is imported."""
+    
+    if name.startswith('df') and name[2:].isdigit():
+        year = int(name[2:])
+        df = create_df(stats, year, get_players_on_money_list(year), cols).reset_index()
+        globals()[name] = df
+        return df
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -0,0 +1,146 @@
+"""This module stores cleaned PGA tour stats in a partitioned columnar store.
+
+Each season is cleaned once and written to its own Parquet partition
+(STORE_DIR/year=2019/season.parquet) with one typed column per stat. Adding a
+season or a stat only rewrites the partitions involved, and queries read only
+the seasons and stat columns that are asked for. Rows are keyed by player_key,
+the player's PGA tour ID from pga_stats_scraper.player_keys(), so stats
+added later join onto the right players.
+
+"""
+
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+from pga_stats_parser import normalize_name
+import pga_stats_scraper as pga
+
+STORE_DIR = 'pga_stats_store'
+"""str: Root directory of the partitioned stats store."""
+
+PARTITION_FILE = 'season.parquet'
+"""str: File name of the Parquet file inside each season partition."""
+
+def partition_path(year, store_dir=STORE_DIR):
+    """Returns the path of the Parquet file holding a season."""
+
+    return os.path.join(store_dir, 'year={}'.format(year), PARTITION_FILE)
+
+def seasons(store_dir=STORE_DIR):
+    """Returns a sorted list of the years already in the store."""
+
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(int(name.split('=')[1]) for name in os.listdir(store_dir)
+                  if name.startswith('year=') and os.path.exists(partition_path(name.split('=')[1], store_dir)))
+
+def clean_season(df, stats=None, names=None):
+    """Turns a long-format frame of parsed stats into a typed wide frame with
+    one row per player and one column per stat.
+
+    Parameters
+    ----------
+    df : <DataFrame> A long-format DataFrame from pga_stats_scraper.load_seasons()
+    for a single season. Only players on the money list are kept when it is
+    included.
+    stats : <list> The stat numbers to keep, defaults to every stat in df.
+    names : <dict> A mapping of stat numbers to column names, defaults to the
+    scraper's stats and cols.
+
+    Returns
+    -------
+    df : <DataFrame> A DataFrame with player_key and player columns and a
+    column per stat.
+
+    """
+    names = names or dict(zip(pga.stats, pga.cols))
+    stats = stats or [stat for stat in pga.stats if stat in set(df['stat'])]
+    df = pga.align_stats(df, stats, names).drop(columns=['player_id', 'year'])
+    df = df.astype({names.get(stat, stat): 'float64' for stat in stats})
+    if 'earnings' in df.columns:
+        df['earnings'] = df['earnings'].round().astype('Int64')
+    return df
+
+def write_season(df, year, store_dir=STORE_DIR):
+    """Writes a cleaned season to its partition. Stat columns already stored
+    for the season but missing from df are kept, so a new stat can be added
+    without re-scraping the others.
+
+    Parameters
+    ----------
+    df : <DataFrame> A cleaned DataFrame from clean_season().
+    year : <int> The season the DataFrame holds.
+    store_dir : <str> Root directory of the store.
+
+    """
+    path = partition_path(year, store_dir)
+    if os.path.exists(path):
+        stored = pd.read_parquet(path)
+        on = 'player_key' if 'player_key' in stored.columns else 'player'
+        kept = [col for col in stored.columns if col not in df.columns]
+        df = stored[[on] + kept].merge(df, on=on, how='outer')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+def add_season(year, stats=None, store_dir=STORE_DIR):
+    """Scrapes, cleans and stores the given stats for a single season.
+
+    Parameters
+    ----------
+    year : <int> The season to add.
+    stats : <list> A list of stat numbers, defaults to all of the scraper's stats.
+    store_dir : <str> Root directory of the store.
+
+    """
+    stats = stats or pga.stats
+    df = pga.load_seasons([year], sorted(set(stats) | {pga.ROSTER_STAT}))
+    write_season(clean_season(df, stats), year, store_dir)
+
+def update_seasons(years, store_dir=STORE_DIR):
+    """Adds every season in years that is not already in the store."""
+
+    stored = set(seasons(store_dir))
+    for year in years:
+        if year not in stored:
+            add_season(year, store_dir=store_dir)
+
+def read_stats(columns=None, years=None, store_dir=STORE_DIR, keys=False):
+    """Reads a subset of stats and seasons from the store. Only the requested
+    partitions and columns are read from disk.
+
+    Parameters
+    ----------
+    columns : <list> A list of stat column names, defaults to all columns.
+    years : <list> A list of seasons, defaults to every stored season.
+    store_dir : <str> Root directory of the store.
+    keys : <bool> Whether to include the player_key column.
+
+    Returns
+    -------
+    df : <DataFrame> A DataFrame with player and year columns and one column
+    per requested stat.
+
+    """
+    years = seasons(store_dir) if years is None else years
+    ids = ['player_key', 'player'] if keys else ['player']
+    columns = None if columns is None else ids + [col for col in columns if col not in ids]
+
+    frames = []
+    for year in years:
+        path = partition_path(year, store_dir)
+        # Partitions written before player_key existed are keyed by name, the
+        # same fallback player_keys() uses for players without an ID
+        legacy = keys and 'player_key' not in pq.read_schema(path).names
+        read = columns if columns is None or not legacy else columns[1:]
+        df = pd.read_parquet(path, columns=read)
+        if legacy:
+            df.insert(0, 'player_key', 'name:' + df['player'].map(normalize_name))
+        if not keys:
+            df = df.drop(columns='player_key', errors='ignore')
+        df.insert(len(ids), 'year', year)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=ids + ['year'] + (columns or [])[len(ids):])
+    return pd.concat(frames, ignore_index=True)
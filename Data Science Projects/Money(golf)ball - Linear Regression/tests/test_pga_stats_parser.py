@@ -0,0 +1,58 @@
+"""Tests for parsing saved PGA tour stat pages."""
+
+import os
+
+import pytest
+
+pytest.importorskip('lxml')
+pytest.importorskip('pandas')
+from pga_stats_parser import parse_stat_table
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parse_selects_columns_by_header():
+    df = parse_stat_table(read_fixture('stat_120_2019.html'), '120', 2019)
+
+    assert list(df.columns) == ['player_id', 'player', 'year', 'stat', 'value']
+    assert df['player'].tolist() == ['Rory McIlroy', 'Webb Simpson', 'C. T. Pan']
+    assert df['value'].tolist() == [69.057, 69.306, 70.412]
+    assert (df['year'] == 2019).all() and (df['stat'] == '120').all()
+
+
+def test_parse_converts_money_and_names_the_stat():
+    df = parse_stat_table(read_fixture('stat_109_2019.html'), '109', 2019, name='earnings')
+
+    assert df['value'].tolist() == [7785286.0, 2467017.0, 2342931.0]
+    assert (df['stat'] == 'earnings').all()
+
+
+def test_parse_does_not_depend_on_column_order():
+    page = read_fixture('stat_120_2019.html')
+    # Move the AVG column in front of the player name in the header and every row
+    page = page.replace('<th class="col-stat">RANK LAST WEEK</th>',
+                        '<th class="col-stat">AVG</th>', 1)
+    page = page.replace('<th class="col-stat">AVG</th>\n          <th class="col-stat">TOTAL',
+                        '<th class="col-stat">RANK LAST WEEK</th>\n          <th class="col-stat">TOTAL')
+    page = page.replace('<td>1</td><td>1</td>', '<td>1</td><td>69.057</td>')
+    page = page.replace('<td>72</td><td>69.057</td>', '<td>72</td><td>1</td>')
+
+    df = parse_stat_table(page, '120', 2019)
+    assert df.loc[df['player'] == 'Rory McIlroy', 'value'].item() == 69.057
+
+
+def test_parse_raises_when_stat_header_is_missing():
+    page = read_fixture('stat_120_2019.html').replace('>AVG<', '>AVERAGE SCORE<')
+
+    with pytest.raises(ValueError, match='missing'):
+        parse_stat_table(page, '120', 2019)
+
+
+def test_parse_raises_without_stats_table():
+    with pytest.raises(ValueError, match='No stats table'):
+        parse_stat_table('<html><body><p>Not found</p></body></html>', '120', 2019)
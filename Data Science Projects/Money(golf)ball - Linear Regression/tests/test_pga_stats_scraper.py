@@ -0,0 +1,99 @@
+"""Tests for fetching and caching PGA tour stat pages."""
+
+import os
+
+import pytest
+
+pytest.importorskip('lxml')
+pytest.importorskip('bs4')
+pytest.importorskip('requests')
+pytest.importorskip('pandas')
+import pga_stats_scraper as pga
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Serves saved stat pages and records every url requested."""
+
+    def __init__(self):
+        self.requested = []
+
+    def get(self, url):
+        self.requested.append(url)
+        stat, year = url.split('details.')[1].split('.scontent')[0].split('.y')
+        return FakeResponse(read_fixture('stat_{}_{}.html'.format(stat, year)))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    """Serves the saved pages and keeps the cache and memoized tables per test."""
+    session = FakeSession()
+    monkeypatch.setattr(pga, 'get_session', lambda max_workers=pga.MAX_WORKERS: session)
+    monkeypatch.setattr(pga, '_parsed', {})
+    # CACHE_DIR is relative, so the cache is created inside tmp_path
+    monkeypatch.chdir(tmp_path)
+    return session
+
+
+def test_fetch_page_writes_and_reads_cache(tmp_path):
+    session = FakeSession()
+    url = pga.get_links(['120'], 2019)[0]
+
+    page = pga.fetch_page(url, session, str(tmp_path))
+    assert session.requested == [url]
+    assert os.path.exists(pga.cache_path(url, str(tmp_path)))
+
+    assert pga.fetch_page(url, session, str(tmp_path)) == page
+    assert session.requested == [url]
+
+
+def test_fetch_pages_only_requests_missing_urls(session):
+    cached, missing = pga.get_links(['120', '109'], 2019)
+    pga.fetch_page(cached, FakeSession())
+
+    pages = pga.fetch_pages([cached, missing, missing])
+    assert set(pages) == {cached, missing}
+    assert session.requested == [missing]
+
+
+def test_money_list_is_fetched_once(session):
+    players = pga.get_players_on_money_list(2019)
+    df = pga.create_df(['120', '109'], 2019, players, ['scoring_avg', 'earnings'])
+
+    money_url = pga.get_links(['109'], 2019)[0]
+    assert session.requested.count(money_url) == 1
+    assert len(session.requested) == 2
+    assert players == ['Rory McIlroy', 'C.T. Pan', 'Jordan Spieth']
+    assert df.loc['Rory McIlroy', 'scoring_avg'] == 69.057
+    # The scoring page spells the name 'C. T. Pan', the money list 'C.T. Pan'
+    assert df.loc['C.T. Pan', 'scoring_avg'] == 70.412
+
+
+def test_money_list_uses_roster_stat(session, monkeypatch):
+    monkeypatch.setattr(pga, 'ROSTER_STAT', '120')
+    assert pga.get_players_on_money_list(2019) == ['Rory McIlroy', 'Webb Simpson', 'C. T. Pan']
+    assert session.requested == pga.get_links(['120'], 2019)
+
+
+def test_load_seasons_without_years_is_empty(session):
+    df = pga.load_seasons([])
+    assert df.empty
+    assert list(df.columns) == ['player_id', 'player', 'year', 'stat', 'value']
+    assert session.requested == []
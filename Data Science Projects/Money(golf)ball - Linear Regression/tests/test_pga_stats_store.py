@@ -0,0 +1,32 @@
+"""Tests for reading the partitioned PGA stats store."""
+
+import os
+
+import pytest
+
+pytest.importorskip('lxml')
+pytest.importorskip('bs4')
+pytest.importorskip('requests')
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+import pga_stats_store as store
+
+
+def write_partition(df, year, store_dir):
+    path = store.partition_path(year, str(store_dir))
+    os.makedirs(os.path.dirname(path))
+    df.to_parquet(path, index=False)
+
+
+def test_read_stats_keys_on_partition_without_player_key(tmp_path):
+    write_partition(pd.DataFrame({'player': ['C. T. Pan'], 'scoring_avg': [70.412]}), 2018, tmp_path)
+    write_partition(pd.DataFrame({'player_key': ['29908'], 'player': ['C.T. Pan'],
+                                  'scoring_avg': [70.1]}), 2019, tmp_path)
+
+    df = store.read_stats(['scoring_avg'], store_dir=str(tmp_path), keys=True)
+    assert list(df.columns) == ['player_key', 'player', 'year', 'scoring_avg']
+    assert df['player_key'].tolist() == ['name:ct pan', '29908']
+    assert df['scoring_avg'].tolist() == [70.412, 70.1]
+
+    df = store.read_stats(store_dir=str(tmp_path), keys=True)
+    assert df['player_key'].tolist() == ['name:ct pan', '29908']
@@ -0,0 +1,160 @@
+"""
+Walk-forward backtesting of the SBA loan default model by
+approval year.
+
+Instead of one random train/test split, the model is trained on
+an expanding or rolling window of approval years and scored on the
+year(s) that follow, for every window in the data. Windows run in
+parallel worker processes.
+
+The cleaned data is split once into per-year partitions on disk.
+Each partition holds the window-independent features (real estate
+flag and bank dummies) and the per-year default counts by state and
+sector, so a window's target encodings are summed from the cached
+counts of its training years instead of being recomputed.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+import pandas as pd
+from sklearn.metrics import fbeta_score, recall_score, roc_auc_score
+from data_cleaning import banks
+from model import create_x_any_y, make_model
+
+PARTITION_DIR = 'year_partitions'
+
+
+def partition_path(year, partition_dir=PARTITION_DIR):
+    """Returns the path of the partition for an approval year.
+    """
+    return os.path.join(partition_dir, 'approv_year={}.pkl'.format(year))
+
+
+def build_partitions(df, partition_dir=PARTITION_DIR, overwrite=False):
+    """Splits cleaned loan data into one partition per approval year.
+    Existing partitions are kept unless overwrite is True.
+
+    Args:
+        df--DataFrame returned by data_cleaning()
+
+    Returns:
+        A sorted list of the approval years in the data.
+    """
+    os.makedirs(partition_dir, exist_ok=True)
+    df = df.copy()
+    df['sector'] = df['sector'].fillna('Not given')
+    df['real_estate'] = (df['term'] > 240).astype(int)
+
+    # A fixed category list gives every year the same dummy columns
+    bank = pd.Categorical(df['bank'], categories=sorted(banks + ['OTHER']))
+    df = df.join(pd.get_dummies(bank, drop_first=True).set_index(df.index))
+
+    years = sorted(df['approv_year'].unique())
+    for year, year_df in df.groupby('approv_year'):
+        path = partition_path(year, partition_dir)
+        if os.path.exists(path) and not overwrite:
+            continue
+        pd.to_pickle({'features': year_df,
+                      'state': year_df.groupby('state')['default'].agg(['sum', 'count']),
+                      'sector': year_df.groupby('sector')['default'].agg(['sum', 'count'])},
+                     path)
+    return years
+
+
+def load_window(years, partition_dir=PARTITION_DIR):
+    """Returns the concatenated features and summed state and sector
+    default counts of the partitions for a list of years.
+    """
+    parts = [pd.read_pickle(partition_path(year, partition_dir)) for year in years]
+    features = pd.concat([part['features'] for part in parts])
+    state = pd.concat([part['state'] for part in parts]).groupby(level=0).sum()
+    sector = pd.concat([part['sector'] for part in parts]).groupby(level=0).sum()
+    return features, state, sector
+
+
+def encode(features, state, sector):
+    """Adds the state and sector default rate features computed from
+    training-window counts, matching feature_engineering().
+    """
+    features = features.copy()
+    state_rate = state['sum'] / state['count']
+    sector_rate = sector['sum'] / sector['count']
+    features['state_default_avg'] = features['state'].map(state_rate).fillna(state_rate.mean())
+    features['sector_default_avg'] = features['sector'].map(sector_rate).fillna(sector_rate.mean())
+    features['state_times_sector_default'] = features['state_default_avg'] * features['sector_default_avg']
+    return features
+
+
+def windows(years, mode='expanding', train_years=5, test_years=1):
+    """Returns a list of (train years, test years) windows.
+
+    Args:
+        years--sorted list of approval years
+        mode--'expanding' trains on every year before the test years,
+            'rolling' trains on the train_years years before them
+        train_years--size of the rolling window and the minimum size of
+            the expanding window
+        test_years--number of years scored after each training window
+
+    Raises:
+        ValueError: mode is not 'expanding' or 'rolling'.
+    """
+    if mode not in ('expanding', 'rolling'):
+        raise ValueError('Invalid mode {}'.format(mode))
+
+    result = []
+    for end in range(train_years, len(years) - test_years + 1):
+        start = 0 if mode == 'expanding' else end - train_years
+        result.append((years[start:end], years[end:end + test_years]))
+    return result
+
+
+def run_window(train, test, partition_dir=PARTITION_DIR):
+    """Trains the model on the train years and scores it on the test
+    years.
+
+    Returns:
+        A dictionary of the window's metrics.
+    """
+    train_features, state, sector = load_window(train, partition_dir)
+    test_features, _, _ = load_window(test, partition_dir)
+    X_train, y_train = create_x_any_y(encode(train_features, state, sector))
+    X_test, y_test = create_x_any_y(encode(test_features, state, sector))
+
+    model = make_model(y_train)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    proba = model.predict_proba(X_test)[:, 1]
+    pred = model.predict(X_test)
+    return {'test_year': test[0] if len(test) == 1 else '{}-{}'.format(test[0], test[-1]),
+            'train_start': train[0],
+            'train_end': train[-1],
+            'train_rows': len(X_train),
+            'test_rows': len(X_test),
+            'fbeta': fbeta_score(y_test, pred, beta=2.0),
+            'recall': recall_score(y_test, pred),
+            'auc': roc_auc_score(y_test, proba) if y_test.nunique() > 1 else float('nan'),
+            'fit_time': fit_time}
+
+
+def backtest(df, mode='expanding', train_years=5, test_years=1, n_jobs=None,
+             partition_dir=PARTITION_DIR, overwrite=True):
+    """Runs a walk-forward backtest over every window in parallel.
+
+    Args:
+        df--DataFrame returned by data_cleaning()
+        n_jobs--number of worker processes, defaults to the number of CPUs
+        overwrite--whether to rebuild the partitions from df. Only pass False
+            to rerun on the same data the partitions were built from.
+
+    Returns:
+        A DataFrame with one row of metrics per window.
+    """
+    years = build_partitions(df, partition_dir, overwrite)
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(run_window, train, test, partition_dir)
+                   for train, test in windows(years, mode, train_years, test_years)]
+        return pd.DataFrame([future.result() for future in futures])
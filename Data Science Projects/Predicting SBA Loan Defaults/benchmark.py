@@ -0,0 +1,141 @@
+"""
+Benchmarks each stage of the SBA loan pipeline on synthetic data
+and compares the results against stored JSON baselines.
+
+Stages timed and memory profiled for every data size:
+  -- data_cleaning() from data_cleaning.py
+  -- feature_engineering() from data_cleaning.py
+  -- model() from model.py (training and pickling)
+  -- scoring with the pickled pipeline and with tree_inference.py
+
+Memory is the peak of Python-level allocations traced by tracemalloc,
+which covers pandas and NumPy but not XGBoost's native buffers.
+Times include the tracemalloc overhead, so only compare them with
+baselines stored by this script.
+
+Usage:
+  python benchmark.py --sizes 10000 100000          # compare to baselines
+  python benchmark.py --sizes 10000 100000 --save   # store new baselines
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+from data_cleaning import data_cleaning, feature_engineering
+from model import create_x_any_y, model
+from synthetic_data import loan_records
+from tree_inference import load_trees, predict_proba
+
+BASELINE_PATH = 'benchmark_baselines.json'
+
+
+def profile(func, *args):
+    """Runs a function and returns its result, wall time in seconds
+    and peak traced memory in MB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1e6
+
+
+def run_stages(n, seed=0):
+    """Runs every pipeline stage on n synthetic rows.
+
+    Returns:
+        A dictionary of stage name to {'seconds', 'peak_mb'}.
+    """
+    results = {}
+
+    def record(name, func, *args):
+        result, seconds, peak_mb = profile(func, *args)
+        results[name] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 2)}
+        return result
+
+    raw = loan_records(n, seed)
+    cleaned = record('data_cleaning', data_cleaning, raw)
+    featured = record('feature_engineering', feature_engineering, cleaned)
+
+    # model() pickles into the working directory and prints its scores
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        try:
+            record('train', model, featured)
+            pipeline = pickle.load(open('final_model.pkl', 'rb'))
+            trees = load_trees('final_model_trees.npz')
+        finally:
+            os.chdir(cwd)
+
+    X, _ = create_x_any_y(featured)
+    record('score_pipeline', pipeline.predict_proba, X)
+    record('score_tree_inference', predict_proba, trees, X.values)
+    return results
+
+
+def compare(results, baselines, threshold=0.2):
+    """Returns a list of messages for every stage whose time or memory
+    is more than threshold above its baseline.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            baseline = baselines.get(size, {}).get(stage)
+            if not baseline:
+                continue
+            for metric, value in metrics.items():
+                if baseline[metric] > 0 and value > baseline[metric] * (1 + threshold):
+                    regressions.append('{} rows, {}: {} {} vs baseline {} (+{:.0%})'.format(
+                        size, stage, metric, value, baseline[metric], value / baseline[metric] - 1))
+    return regressions
+
+
+def main():
+    """Runs the benchmark suite and stores or compares baselines.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed fractional increase over the baseline')
+    parser.add_argument('--baselines', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run_stages(size, args.seed)
+        for stage, metrics in results[str(size)].items():
+            print('{:>8} rows  {:<22} {:>9.4f} s  {:>9.2f} MB'.format(
+                size, stage, metrics['seconds'], metrics['peak_mb']))
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Saved baselines to {}'.format(args.baselines))
+        return
+
+    regressions = compare(results, baselines, args.threshold)
+    for message in regressions:
+        print('REGRESSION: ' + message)
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compares the one-hot and native categorical training paths of
+the SBA loan default model.
+
+For each path this script reports the width and memory of the
+feature matrix and the time to fit the oversampling and XGBoost
+pipeline on the same rows.
+"""
+
+import sys
+import time
+import pandas as pd
+from model import create_x_any_y, make_model
+
+
+def one_hot(data):
+    """Returns the data with one-hot bank columns as created by
+    feature_engineering(df), adding them if the data only has
+    the bank column.
+    """
+    if 'OTHER' in data.columns:
+        return data
+    return data.join(pd.get_dummies(data['bank'], drop_first=True))
+
+
+def benchmark(data, repeat=3):
+    """Returns a DataFrame with the number of features, feature
+    matrix memory in MB and best fit time in seconds for each path.
+
+    Args:
+        data--cleaned and feature engineered loan DataFrame
+        repeat--number of fits to take the best time of
+    """
+    rows = []
+    for name, categorical in [('one-hot', False), ('categorical', True)]:
+        X, y = create_x_any_y(data if categorical else one_hot(data), categorical)
+
+        fit_times = []
+        for _ in range(repeat):
+            model = make_model(y, categorical)
+            start = time.perf_counter()
+            model.fit(X, y)
+            fit_times.append(time.perf_counter() - start)
+
+        rows.append({'path': name,
+                     'features': X.shape[1],
+                     'memory_mb': X.memory_usage(deep=True).sum() / 1e6,
+                     'fit_seconds': min(fit_times)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    print(benchmark(pd.read_csv(sys.argv[1] if len(sys.argv) > 1 else 'sba_data.csv')))
@@ -20,6 +20,8 @@ banks = ['BANK OF AMERICA NATL ASSOC',
          'PNC BANK, NATIONAL ASSOCIATION',
          'CAPITAL ONE NATL ASSOC']
 
+categorical_features = ['bank', 'state', 'sector']
+
 
 # Load data into DataFrame
 def get_data_from_aws(query):
@@ -62,7 +64,7 @@ def data_cleaning(df, options=[1, 0], banks=banks):
     # Changing column values to binary
     df['new_exist'].replace((1, 2), (0, 1), inplace=True)
     df['rev_line_cr'].replace(('Y', 'N', '0'), (1, 0, 0), inplace=True)
-    df['low_doc'].replace(('Y', 'N', '0'), (1, 0), inplace=True)
+    df['low_doc'].replace(('Y', 'N', '0'), (1, 0, 0), inplace=True)
     df = df[df['rev_line_cr'].isin(options)]
     df['rev_line_cr'] = df['rev_line_cr'].astype(int)
     df = df[df['low_doc'].isin(options)]
@@ -114,27 +116,29 @@ def data_cleaning(df, options=[1, 0], banks=banks):
 
 
 # Feature engineering for the data
-def feature_engineering(df):
+def feature_engineering(df, categorical=False):
     """Returns a DataFrame with columns added for
     real estate collateral, default rates for state and sector,
     and one-hot encoding for banks.
+
+    With categorical=True, bank, state and sector are kept as pandas
+    categoricals for XGBoost's native categorical support instead of
+    one-hot encoding banks.
     """
 
     # Add column for real estate
     df['real_estate'] = df['term'].apply(lambda x: 1 if x > 240 else 0)
 
-    # Add column for state default rates gathered from training set
-    map_state_default = dict(train.groupby(['state'])['default'].mean())
-    df['state_default_avg'] = df['state'].map(map_state_default)
-
-    # Add column for sector default rates gathered from training set
-    map_sector_default = dict(df.groupby(['sector'])['default'].mean())
-    df['sector_default_avg'] = df['sector'].map(map_sector_default)
+    # Add columns for state and sector default rates. These are gathered from
+    # every row of df; split() in model.py recomputes them from the training set
     df['sector'] = df['sector'].fillna('Not given')
-    df['sector_default_avg'] = df['sector_default_avg'].fillna(df['sector_default_avg'].mean())
+    df = add_default_rates(df, df)
 
-    # Create dummy columns for bank
-    df = df.join(pd.get_dummies(df['bank'], drop_first=True))
+    if categorical:
+        df = to_categorical(df)
+    else:
+        # Create dummy columns for bank
+        df = df.join(pd.get_dummies(df['bank'], drop_first=True))
 
     # Create interaction term column for state default times sector default
     df['state_times_sector_default'] = df['state_default_avg'] * df['sector_default_avg']
@@ -142,6 +146,42 @@ def feature_engineering(df):
     return df
 
 
+def add_default_rates(df, train):
+    """Returns a DataFrame with the state and sector default rate
+    columns set to the mean default of each state and sector in
+    train. States and sectors not in train get the mean rate.
+
+    Args:
+        df--loan DataFrame to add the columns to
+        train--loan DataFrame with the default target to take the
+        rates from, so test loans never see their own targets
+    """
+    df = df.copy()
+    for col in ['state', 'sector']:
+        rates = train['default'].groupby(train[col].astype(object)).mean()
+        df[col + '_default_avg'] = df[col].astype(object).map(rates).astype(float).fillna(rates.mean())
+    if 'state_times_sector_default' in df.columns:
+        df['state_times_sector_default'] = df['state_default_avg'] * df['sector_default_avg']
+    return df
+
+
+def to_categorical(df, categories=None):
+    """Returns a DataFrame with the categorical feature columns converted to
+    pandas categoricals. Passing the categories stored with a trained model
+    gives new data the same category codes the model was trained on, with
+    unseen values treated as missing.
+
+    Args:
+        categories--dict of column name to list of categories, inferred from
+        df when None
+    """
+    df = df.copy()
+    for col in categorical_features:
+        cats = None if categories is None else categories[col]
+        df[col] = pd.Categorical(df[col], categories=cats)
+    return df
+
+
 def main():
     """Loads the SBA loan dataset, performs data cleaning and feature engineering,
     and saves the dataset as a csv file.
@@ -157,4 +197,5 @@ def main():
     sba_data.to_csv('sba_data.csv')
 
 
-main()
+if __name__ == '__main__':
+    main()
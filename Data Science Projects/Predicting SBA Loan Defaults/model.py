@@ -4,65 +4,119 @@ of SBA loans.
 
 Model details
   -- 80% train and 20% test sets
-  -- One hot encoded categorical feature for banks
+  -- One hot encoded categorical feature for banks, or bank, state and sector
+     as native XGBoost categoricals with categorical=True
   -- Random oversampling to account for imbalanced class sizes
 """
 
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import fbeta_score
+from sklearn.metrics import fbeta_score, confusion_matrix
 from xgboost import XGBClassifier
 from imblearn.over_sampling import RandomOverSampler
 from imblearn.pipeline import Pipeline, make_pipeline
 import pickle
+from data_cleaning import add_default_rates, banks, categorical_features, to_categorical
+from tree_inference import check_against_xgboost, export_trees
 
 
-def create_x_any_y(data):
+def create_x_any_y(data, categorical=False, categories=None):
     """Returns X and y DataFrames. Columns chosen for
     X were discovered to be the most significant during
     exploratory data analysis and model testing.
+
+    With categorical=True, the bank, state and sector columns
+    are kept as pandas categoricals, using the category lists in
+    categories when given so codes match another frame.
     """
-    X = data.drop(['city', 'state', 'zip', 'bank', 'bank_state', 'naics', 'approv_date',
-                      'approv_year', 'disburse_date', 'mis_status', 'balance_gross',
-                      'chg_off_gross', 'gross_approve', 'sba_approve', 'sector', 'default'], axis=1)
+    drop = ['city', 'state', 'zip', 'bank', 'bank_state', 'naics', 'approv_date',
+            'approv_year', 'disburse_date', 'mis_status', 'balance_gross',
+            'chg_off_gross', 'gross_approve', 'sba_approve', 'sector', 'default']
+    if categorical:
+        # Bank dummy columns are replaced by the bank categorical
+        drop = [col for col in drop if col not in categorical_features]
+        drop += [col for col in data.columns if col in banks or col == 'OTHER']
+        data = to_categorical(data, categories)
+
+    X = data.drop(drop, axis=1)
     y = data['default']
     return X, y
 
 
-def split(data):
+def split(data, categorical=False):
     """Returns a train set of 80% and test set of 20%
     of the data for both features and targets.
+
+    The state and sector default rates are recomputed from
+    the train set only, so test targets do not leak into
+    the features. With categorical=True, the test set uses the
+    categories of the train set, so both have the same codes.
     """
-    X, y = create_x_any_y(data)
-    X_train, y_train, X_test, y_test = train_test_split(X, y, test_size=.2)
+    train, test = train_test_split(data, test_size=.2)
+    X_train, y_train = create_x_any_y(add_default_rates(train, train), categorical)
+    categories = categories_of(X_train) if categorical else None
+    X_test, y_test = create_x_any_y(add_default_rates(test, train), categorical, categories)
 
     return X_train, X_test, y_train, y_test
 
 
-def model(data):
+def categories_of(X):
+    """Returns a dict of each categorical feature column of X
+    to its list of categories.
+    """
+    return {col: list(X[col].cat.categories) for col in categorical_features}
+
+
+def make_model(y_train, categorical=False):
+    """Returns the oversampling and XGBoost pipeline. With categorical=True,
+    XGBoost uses the hist tree method with native categorical splits.
+    """
+    pos = np.sum(y_train == 1)
+    neg = np.sum(y_train == 0)
+    ratio = {1: pos * 6, 0: neg}
+
+    params = {'tree_method': 'hist', 'enable_categorical': True} if categorical else {}
+    return make_pipeline(RandomOverSampler(sampling_strategy=ratio),
+                         XGBClassifier(n_estimators=86,
+                                       max_depth=7,
+                                       learning_rate=.2,
+                                       **params))
+
+
+def predict_categorical(bundle, X):
+    """Predicts with a model saved by model(data, categorical=True), applying
+    the category mapping stored with it to X first.
+    """
+    return bundle['model'].predict(to_categorical(X, bundle['categories']))
+
+
+def model(data, categorical=False):
     """Deploys an XGBoost model on the training data to predict
     whether or not an SBA loan will default. The model is
     then pickled for further use.
 
+    With categorical=True, the model is pickled to final_model_categorical.pkl
+    together with the category mapping of each categorical column.
+
     Prints the true/false positives and
     negatives as well as an FBeta score weighting recall
     twice as important as precision.
     """
 
-    X_train, X_test, y_train, y_test = split(data)
-
-    pos = np.sum(y_train == 1)
-    neg = np.sum(y_train == 0)
-    ratio = {1: pos * 6, 0: neg}
+    X_train, X_test, y_train, y_test = split(data, categorical)
 
-    model = make_pipeline(RandomOverSampler(sampling_strategy=ratio),
-                          XGBClassifier(n_estimators=86,
-                                        max_depth=7,
-                                        learning_rate=.2))
+    model = make_model(y_train, categorical)
 
     model.fit(X_train, y_train)
-    pickle.dump(model, open('final_model.pkl', 'wb'))
+    if categorical:
+        pickle.dump({'model': model, 'categories': categories_of(X_train)}, open('final_model_categorical.pkl', 'wb'))
+    else:
+        pickle.dump(model, open('final_model.pkl', 'wb'))
+        # The exported trees are only saved once they match XGBoost on the test set
+        trees = export_trees(model)
+        check_against_xgboost(model, X_test.values, trees)
+        np.savez('final_model_trees.npz', **trees)
 
     tn, fp, fn, tp = confusion_matrix(y_test, model.predict(X_test)).ravel()
 
@@ -80,4 +134,5 @@ def main():
     model(df)
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,10 @@ from loan_mapping import map_sector_default, map_state_default, cols
 import numpy as np
 import pandas as pd
 import time
+import matplotlib.pyplot as plt
 
 my_model = pickle.load(open("final_model.pkl", "rb"))
+LOW_DOC = 1.0
 st.title('Are you approved for an SBA loan?')
 st.text('\n')
 st.text('The United States SBA was founded in 1953 to promote small \n'
@@ -94,7 +96,10 @@ user_inputs = [term, employees, new_existing, jobs_created, jobs_retained, franc
                rev_cred, gross, state, sector, bank]
 
 
-def loan_approved(inputs, model=my_model, cols=cols):
+def input_row(inputs):
+    """Returns the model features for one set of user inputs as an
+    array in the order of cols.
+    """
     loan_term = float(inputs[0])
     num_employee = float(inputs[1])
     new_exist = 1.0 if inputs[2] == 'New' else 0.0
@@ -103,9 +108,12 @@ def loan_approved(inputs, model=my_model, cols=cols):
     is_franchise = float(inputs[5])
     is_urban = float(inputs[6])
     rev_credit = float(inputs[7])
-    low_doc = 1.0 if term < 25000 else 0.0
+    # low_doc is the LowDoc program flag recorded on each loan in training, not
+    # something derived from amount or term. The app does not ask for it, so it
+    # is a constant, the 1.0 the app has always sent, and the grids never move it
+    low_doc = LOW_DOC
     value = inputs[8]
-    real_estate = 0
+    real_estate = 1 if loan_term > 240 else 0
     state_default_avg = map_state_default[inputs[9]]
     sector_avg_default = map_sector_default[inputs[10]]
     capital_one = 1 if inputs[11] == 'Capital One National' else 0
@@ -117,12 +125,14 @@ def loan_approved(inputs, model=my_model, cols=cols):
     wells_fargo_bank = 1 if inputs[11] == 'Wells Fargo' else 0
     state_times_sector = state_default_avg * sector_avg_default
 
-    input_df = pd.DataFrame(np.array([loan_term, num_employee, new_exist, create, retained, is_franchise,
-                                      is_urban, rev_credit, low_doc, value, real_estate, state_default_avg,
-                                      sector_avg_default, capital_one, citizens_bank, chase_bank,
-                                      other_bank, pnc_bank, us_bank, wells_fargo_bank, state_times_sector])).T
+    return np.array([loan_term, num_employee, new_exist, create, retained, is_franchise,
+                     is_urban, rev_credit, low_doc, value, real_estate, state_default_avg,
+                     sector_avg_default, capital_one, citizens_bank, chase_bank,
+                     other_bank, pnc_bank, us_bank, wells_fargo_bank, state_times_sector], dtype=float)
+
 
-    input_df.columns = cols
+def loan_approved(inputs, model=my_model, cols=cols):
+    input_df = pd.DataFrame(input_row(inputs)[None, :], columns=cols)
 
     pred = model.predict(input_df)
 
@@ -133,9 +143,85 @@ def loan_approved(inputs, model=my_model, cols=cols):
         st.warning("Unfortunately, this loan cannot be approved at this time.")
 
 
+def sensitivity_grid(inputs, x_values, y_values, columns, cols=cols):
+    """Builds a preallocated feature matrix with one row for every
+    combination of x_values and y_values around the user inputs,
+    x varying slowest.
+
+    Args:
+        inputs--the user inputs the grid is centered on
+        x_values, y_values--values of each axis
+        columns--function taking a 2D array of x values and a 2D array of
+            y values and returning a dict of column name to 2D array of
+            feature values to overwrite
+    """
+    xs, ys = np.meshgrid(np.asarray(x_values), np.asarray(y_values), indexing='ij')
+    grid = np.empty((xs.size, len(cols)), dtype=float)
+    grid[:] = input_row(inputs)
+    for col, values in columns(xs, ys).items():
+        grid[:, cols.index(col)] = np.ravel(values)
+    return pd.DataFrame(grid, columns=cols)
+
+
+def amount_term_grid(inputs):
+    """Returns the features, axis labels and axis values of the
+    sensitivity grid over loan amount and term.
+    """
+    amounts = np.arange(500, 200001, 2500)
+    terms = np.arange(6, 361, 6)
+    features = sensitivity_grid(inputs, amounts, terms,
+                                lambda a, t: {'disburse_gross': a, 'term': t, 'real_estate': t > 240})
+    return features, ('Loan amount (USD)', amounts), ('Term (months)', terms)
+
+
+def state_sector_grid(inputs):
+    """Returns the features, axis labels and axis values of the
+    sensitivity grid over state and sector.
+    """
+    states = sorted(map_state_default)
+    sectors = sorted(map_sector_default)
+    state_avg = np.array([map_state_default[s] for s in states])
+    sector_avg = np.array([map_sector_default[s] for s in sectors])
+    features = sensitivity_grid(inputs, state_avg, sector_avg,
+                                lambda s, c: {'state_default_avg': s, 'sector_default_avg': c,
+                                              'state_times_sector_default': s * c})
+    return features, ('State', states), ('Sector', sectors)
+
+
+def sensitivity_heatmap(features, x_axis, y_axis, model=my_model):
+    """Scores every row of a sensitivity grid in one batched
+    predict_proba call and draws a heatmap of default probability.
+    """
+    (x_name, x_values), (y_name, y_values) = x_axis, y_axis
+    start = time.perf_counter()
+    proba = model.predict_proba(features)[:, 1].reshape(len(x_values), len(y_values))
+    elapsed = time.perf_counter() - start
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    image = ax.imshow(proba.T, origin='lower', aspect='auto', cmap='RdYlGn_r', vmin=0, vmax=1)
+    for set_ticks, set_labels, values in ((ax.set_xticks, ax.set_xticklabels, x_values),
+                                          (ax.set_yticks, ax.set_yticklabels, y_values)):
+        ticks = np.unique(np.linspace(0, len(values) - 1, min(len(values), 20)).astype(int))
+        set_ticks(ticks)
+        set_labels([values[i] for i in ticks], fontsize=7)
+    plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.set_xlabel(x_name)
+    ax.set_ylabel(y_name)
+    fig.colorbar(image, ax=ax, label='Probability of default')
+    fig.tight_layout()
+    st.pyplot(fig)
+    st.text('Scored {:,} variants in {:.3f} seconds.'.format(proba.size, elapsed))
+
+
 approve = st.button('Check if loan is approved...')
 
 if approve:
-    with st.spinner('Wait for it...'):
-        time.sleep(3)
-        loan_approved(user_inputs)
+    loan_approved(user_inputs)
+
+st.subheader('What-if sensitivity')
+grid_axes = st.radio('Which inputs should vary?', ('Loan amount and term', 'State and sector'))
+
+if st.button('Show default probability heatmap'):
+    grid = amount_term_grid if grid_axes == 'Loan amount and term' else state_sector_grid
+    with st.spinner('Scoring...'):
+        sensitivity_heatmap(*grid(user_inputs))
@@ -0,0 +1,80 @@
+"""
+Generates synthetic SBA loan data shaped like the loan_records
+table in Postgres, for benchmarking the pipeline without access
+to the production database.
+
+The data has the same columns as loan_records and the same messy
+string formats that data_cleaning() handles: dollar amounts like
+'$60,000.00 ', approval years like '1976A', 'Y'/'N'/'0' flags,
+'P I F'/'CHGOFF' statuses and nulls.
+"""
+
+import numpy as np
+import pandas as pd
+from data_cleaning import banks
+
+states = ['AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA',
+          'ID', 'IL', 'IN', 'KS', 'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS',
+          'MT', 'NC', 'ND', 'NE', 'NH', 'NJ', 'NM', 'NV', 'NY', 'OH', 'OK', 'OR', 'PA',
+          'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA', 'WI', 'WV', 'WY']
+
+naics_sectors = ['00', '11', '21', '22', '23', '31', '32', '33', '42', '44', '45', '48',
+                 '49', '51', '52', '53', '54', '55', '56', '61', '62', '71', '72', '81', '92']
+
+
+def dollars(amounts):
+    """Formats amounts the way loan_records stores them, e.g. '$60,000.00 '.
+    """
+    return pd.Series(amounts).map('${:,.2f} '.format)
+
+
+def loan_records(n, seed=0, default_rate=0.18, null_rate=0.001):
+    """Returns a DataFrame of n synthetic rows shaped like loan_records.
+
+    Args:
+        n--number of rows
+        seed--random seed, the same seed always gives the same data
+        default_rate--share of loans charged off
+        null_rate--share of nulls put into city and bank_state
+    """
+    rng = np.random.default_rng(seed)
+    default = rng.random(n) < default_rate
+    gross = np.round(rng.lognormal(11, 1.1, n), -2)
+    approv_year = rng.integers(1970, 2015, n)
+    other_banks = np.array(['BANK {}'.format(i) for i in range(50)])
+
+    df = pd.DataFrame({
+        'loan_num': np.arange(1000000000, 1000000000 + n),
+        'biz_name': pd.Series(rng.integers(0, n, n)).map('BUSINESS {}'.format),
+        'city': pd.Series(rng.integers(0, 500, n)).map('CITY {}'.format),
+        'state': rng.choice(states, n),
+        'zip': rng.integers(10000, 99999, n),
+        'bank': np.where(rng.random(n) < 0.4, rng.choice(banks, n), rng.choice(other_banks, n)),
+        'bank_state': rng.choice(states, n),
+        'naics': [int(sector + str(suffix)) if sector != '00' else 0
+                  for sector, suffix in zip(rng.choice(naics_sectors, n), rng.integers(1000, 9999, n))],
+        'approv_date': pd.Series(approv_year).map('15-Mar-{}'.format),
+        'approv_year': pd.Series(approv_year.astype(str)).where(rng.random(n) > 0.001, '1976A'),
+        'term': rng.choice([12, 36, 60, 84, 120, 180, 240, 300], n),
+        'num_emp': rng.poisson(10, n),
+        'new_exist': rng.choice([1, 2, 0], n, p=[0.7, 0.29, 0.01]),
+        'create_job': rng.poisson(2, n),
+        'retained_job': rng.poisson(5, n),
+        'franchise_code': rng.choice([0, 1, 12345], n, p=[0.5, 0.45, 0.05]),
+        'urban_rural': rng.choice([0, 1, 2], n),
+        'rev_line_cr': rng.choice(['N', 'Y', '0', 'T'], n, p=[0.5, 0.3, 0.15, 0.05]),
+        'low_doc': rng.choice(['N', 'Y', '0', 'C'], n, p=[0.85, 0.1, 0.03, 0.02]),
+        'chg_off_date': np.where(default, '30-Jun-2010', None),
+        'disburse_date': pd.Series(approv_year).map('31-Mar-{}'.format),
+        'disbursement_gross': dollars(gross),
+        'balance_gross': dollars(np.zeros(n)),
+        'mis_status': np.where(default, 'CHGOFF', 'P I F'),
+        'chg_off_gross': dollars(np.where(default, gross * rng.random(n), 0)),
+        'gross_approve': dollars(gross),
+        'sba_approve': dollars(gross * 0.75),
+    })
+
+    # data_cleaning() drops chg_off_date before dropping nulls, so nulls go elsewhere
+    for col in ['city', 'bank_state']:
+        df.loc[rng.random(n) < null_rate, col] = None
+    return df
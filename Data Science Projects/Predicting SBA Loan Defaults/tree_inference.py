@@ -0,0 +1,206 @@
+"""
+A dependency-free inference engine for the SBA loan default model.
+
+The trees of the trained XGBoost booster are exported once into
+flat NumPy arrays (split feature, threshold, children, default
+direction for missing values and leaf value) and saved as a .npz
+file. Scoring only needs NumPy: every row walks all of the trees
+at once, one tree level per step, over the whole batch.
+
+XGBoost is only needed to export the trees and by check_against_xgboost().
+"""
+
+import json
+import time
+import numpy as np
+
+CHUNK_ROWS = 65536
+
+
+def booster_of(model):
+    """Returns the XGBoost Booster of a Booster, an XGBClassifier
+    or a pipeline ending in an XGBClassifier.
+    """
+    if hasattr(model, 'steps'):
+        model = model.steps[-1][1]
+    return model.get_booster() if hasattr(model, 'get_booster') else model
+
+
+def export_trees(model, path=None):
+    """Exports the trees of a trained model into flat arrays.
+
+    Args:
+        model--an XGBoost Booster, XGBClassifier or the pipeline from model.py
+        path--optional .npz path to save the arrays to
+
+    Returns:
+        A dictionary of arrays, with node indices global across trees:
+            feature--split feature index, -1 for leaves
+            threshold--split threshold, rows with x < threshold go left
+            left, right, missing--child node indices
+            value--leaf values
+            roots--root node index of each tree
+            base_margin--the margin every prediction starts from
+            max_depth--the depth of the deepest tree
+
+    Raises:
+        ValueError: The booster has categorical splits or is not a
+            binary:logistic model.
+    """
+    booster = booster_of(model)
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError('Only binary:logistic models are supported, got {}'.format(objective))
+    base_score = float(config['learner']['learner_model_param']['base_score'])
+
+    names = booster.feature_names or []
+    positions = {name: i for i, name in enumerate(names)}
+    feature, threshold, left, right, missing, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+
+    for dump in booster.get_dump(dump_format='json'):
+        offset = len(feature)
+        nodes = {}
+        stack = [(json.loads(dump), 0)]
+        while stack:
+            node, depth = stack.pop()
+            nodes[node['nodeid']] = node
+            max_depth = max(max_depth, depth)
+            stack.extend((child, depth + 1) for child in node.get('children', []))
+
+        # Node ids can have gaps after pruning, so renumber them densely
+        local = {nodeid: offset + i for i, nodeid in enumerate(sorted(nodes))}
+        roots.append(local[0])
+        for nodeid in sorted(nodes):
+            node = nodes[nodeid]
+            if 'leaf' in node:
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(local[nodeid])
+                right.append(local[nodeid])
+                missing.append(local[nodeid])
+                value.append(node['leaf'])
+                continue
+            if 'split_condition' not in node or 'categories' in node:
+                raise ValueError('Categorical splits are not supported')
+            split = node['split']
+            feature.append(positions[split] if split in positions else int(split.lstrip('f')))
+            threshold.append(node['split_condition'])
+            left.append(local[node['yes']])
+            right.append(local[node['no']])
+            missing.append(local[node['missing']])
+            value.append(0.0)
+
+    trees = {'feature': np.array(feature, dtype=np.int32),
+             'threshold': np.array(threshold, dtype=np.float32),
+             'left': np.array(left, dtype=np.int32),
+             'right': np.array(right, dtype=np.int32),
+             'missing': np.array(missing, dtype=np.int32),
+             'value': np.array(value, dtype=np.float32),
+             'roots': np.array(roots, dtype=np.int32),
+             'base_margin': np.float32(np.log(base_score / (1 - base_score))),
+             'max_depth': np.int32(max_depth)}
+    if path:
+        np.savez(path, **trees)
+    return trees
+
+
+def load_trees(path):
+    """Loads arrays saved by export_trees() into a dictionary.
+    """
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def predict_margin(trees, X):
+    """Returns the raw margin for every row of X by walking all trees
+    one level at a time over the whole batch.
+
+    Args:
+        trees--arrays from export_trees() or load_trees()
+        X--2D array of features in the order the model was trained on
+    """
+    X = np.asarray(X, dtype=np.float32)
+    X = X.reshape(1, -1) if X.ndim == 1 else X
+    margins = np.empty(len(X), dtype=np.float32)
+    feature, threshold = trees['feature'], trees['threshold']
+    left, right, missing = trees['left'], trees['right'], trees['missing']
+
+    for start in range(0, len(X), CHUNK_ROWS):
+        chunk = X[start:start + CHUNK_ROWS]
+        rows = np.arange(len(chunk))[:, None]
+        nodes = np.broadcast_to(trees['roots'], (len(chunk), len(trees['roots']))).copy()
+        for _ in range(int(trees['max_depth'])):
+            split = feature[nodes]
+            x = chunk[rows, np.maximum(split, 0)]
+            nodes = np.where(np.isnan(x), missing[nodes],
+                             np.where(x < threshold[nodes], left[nodes], right[nodes]))
+        margins[start:start + CHUNK_ROWS] = trees['base_margin'] + trees['value'][nodes].sum(axis=1)
+    return margins
+
+
+def predict_proba(trees, X):
+    """Returns the probability of default for every row of X.
+    """
+    return 1.0 / (1.0 + np.exp(-predict_margin(trees, X)))
+
+
+def predict(trees, X, threshold=0.5):
+    """Returns 1 for rows predicted to default and 0 otherwise.
+    """
+    return (predict_proba(trees, X) > threshold).astype(np.int32)
+
+
+def check_against_xgboost(model, X, trees=None, tol=1e-5):
+    """Compares the probabilities of this engine against XGBoost on X.
+
+    Returns:
+        The largest absolute difference in probability.
+
+    Raises:
+        AssertionError: The difference is larger than tol.
+    """
+    import xgboost
+
+    booster = booster_of(model)
+    trees = trees or export_trees(booster)
+    expected = booster.predict(xgboost.DMatrix(np.asarray(X, dtype=np.float32),
+                                               feature_names=booster.feature_names))
+    diff = float(np.max(np.abs(predict_proba(trees, X) - expected)))
+    assert diff <= tol, 'Largest probability difference {} is above {}'.format(diff, tol)
+    return diff
+
+
+def benchmark(trees, n_features, sizes=(1000, 10000, 100000, 1000000), repeat=100, seed=0):
+    """Times single-row latency and batch throughput on random rows.
+
+    Returns:
+        A list of (rows, seconds, rows per second) tuples, starting
+        with the median single-row latency.
+    """
+    rng = np.random.default_rng(seed)
+    row = rng.normal(size=(1, n_features)).astype(np.float32)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_proba(trees, row)
+        latencies.append(time.perf_counter() - start)
+    results = [(1, float(np.median(latencies)), 1 / float(np.median(latencies)))]
+
+    for size in sizes:
+        X = rng.normal(size=(size, n_features)).astype(np.float32)
+        start = time.perf_counter()
+        predict_proba(trees, X)
+        seconds = time.perf_counter() - start
+        results.append((size, seconds, size / seconds))
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    trees = load_trees(sys.argv[1] if len(sys.argv) > 1 else 'final_model_trees.npz')
+    n_features = int(trees['feature'].max()) + 1
+    for rows, seconds, rate in benchmark(trees, n_features):
+        print('{:>9} rows: {:.6f} s, {:,.0f} rows/sec'.format(rows, seconds, rate))
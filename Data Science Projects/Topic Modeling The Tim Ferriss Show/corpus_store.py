@@ -0,0 +1,183 @@
+"""
+This module stores the Tim Ferriss Show transcripts in a SQLite document store
+that each stage of the pipeline reads from and writes to incrementally.
+
+Every document is keyed by its stage and episode URL and stores a hash of its
+content along with the hash of the upstream document it was built from. A
+stage only processes documents whose upstream content hash changed since it
+last ran, so adding one episode only processes that episode.
+
+Stages:
+    raw -- the scraped transcript text
+    tokens -- the lemma term IDs of the cleaned transcript and a noun flag for
+        each token, stored as an int32 array of shape (2, n_tokens)
+
+Term IDs index the vocab table, which only ever grows, so an ID never changes
+meaning between runs.
+"""
+
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+
+STORE_PATH = "tfs_corpus.db"
+
+
+def connect(path=STORE_PATH):
+    """Opens the document store, creating the table if needed.
+
+    Args:
+        path -- (str) the path of the SQLite database
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS documents (
+                        stage TEXT NOT NULL,
+                        episode TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        source_hash TEXT,
+                        PRIMARY KEY (stage, episode))""")
+    conn.execute("CREATE TABLE IF NOT EXISTS vocab (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL)")
+    return conn
+
+
+def content_hash(content):
+    """Returns the SHA-1 hash of a document's text or bytes.
+    """
+    return hashlib.sha1(content if isinstance(content, bytes) else content.encode("utf-8")).hexdigest()
+
+
+def term_ids(conn, terms):
+    """Returns a dictionary of term IDs for a collection of terms, adding any
+    new terms to the vocab table.
+    """
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO vocab (term) VALUES (?)", ((term,) for term in set(terms)))
+    return dict(conn.execute("SELECT term, id FROM vocab"))
+
+
+def vocab_terms(conn):
+    """Returns an array of terms indexed by term ID.
+    """
+    vocab = conn.execute("SELECT id, term FROM vocab").fetchall()
+    terms = np.empty(max((i for i, _ in vocab), default=0) + 1, dtype=object)
+    for i, term in vocab:
+        terms[i] = term
+    return terms
+
+
+def encode_tokens(ids, is_noun):
+    """Packs a document's term IDs and noun flags into bytes for storage.
+    """
+    return np.array([ids, is_noun], dtype=np.int32).reshape(2, -1).tobytes()
+
+
+def decode_tokens(content):
+    """Unpacks the bytes from encode_tokens() into an int32 array of shape (2, n_tokens).
+    """
+    return np.frombuffer(content, dtype=np.int32).reshape(2, -1)
+
+
+def put(conn, stage, docs):
+    """Inserts or replaces documents in a stage.
+
+    Args:
+        conn -- (Connection) a connection from connect()
+        stage -- (str) the stage the documents belong to
+        docs -- (list) a list of (episode, content, source_hash) tuples
+    """
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                         [(stage, episode, content, content_hash(content), source_hash)
+                          for episode, content, source_hash in docs])
+
+
+def put_new(conn, stage, docs):
+    """Stores only the documents that are new or whose content changed, so
+    downstream stages are not rerun for unchanged documents. Returns the
+    number of documents written.
+
+    Args:
+        conn -- (Connection) a connection from connect()
+        stage -- (str) the stage the documents belong to
+        docs -- (list) a list of (episode, content) tuples
+    """
+    stored = dict(conn.execute("SELECT episode, content_hash FROM documents WHERE stage = ?", (stage,)))
+    changed = [(episode, content, None) for episode, content in docs
+               if stored.get(episode) != content_hash(content)]
+    put(conn, stage, changed)
+    return len(changed)
+
+
+def stale(conn, source_stage, stage):
+    """Returns the documents of source_stage that have not been processed into
+    stage, or that changed since they were. Their content is not read, so the
+    list stays small however large the documents are.
+
+    Returns:
+        docs -- (list) a list of (episode, content_hash) tuples
+    """
+    return conn.execute("""SELECT src.episode, src.content_hash
+                           FROM documents src
+                           LEFT JOIN documents dst
+                             ON dst.stage = ? AND dst.episode = src.episode
+                           WHERE src.stage = ?
+                             AND (dst.source_hash IS NULL OR dst.source_hash != src.content_hash)
+                           ORDER BY src.episode""", (stage, source_stage)).fetchall()
+
+
+def run_stage(conn, source_stage, stage, func, batch_size=16):
+    """Applies a function to every stale document of source_stage and stores
+    the output in stage. Documents are read, processed and committed in batches,
+    so only one batch of content is in memory at a time and an interrupted run
+    keeps the batches already finished.
+
+    Args:
+        conn -- (Connection) a connection from connect()
+        source_stage -- (str) the stage to read documents from
+        stage -- (str) the stage to write documents to
+        func -- (function) takes a list of document contents and returns a list
+            of processed contents (text or bytes)
+        batch_size -- (int) the number of documents per batch
+
+    Returns:
+        processed -- (int) the number of documents processed
+    """
+    docs = stale(conn, source_stage, stage)
+    for i in range(0, len(docs), batch_size):
+        episodes = [episode for episode, _ in docs[i:i + batch_size]]
+        batch = conn.execute("""SELECT episode, content, content_hash FROM documents
+                                WHERE stage = ? AND episode IN ({})
+                                ORDER BY episode""".format(', '.join('?' * len(episodes))),
+                             [source_stage] + episodes).fetchall()
+        outputs = func([content for _, content, _ in batch])
+        put(conn, stage, [(episode, output, source_hash)
+                          for (episode, _, source_hash), output in zip(batch, outputs)])
+    return len(docs)
+
+
+def get_stage(conn, stage):
+    """Returns a DataFrame of the episode and content of every document in a stage.
+    """
+    return pd.read_sql_query("SELECT episode, content FROM documents WHERE stage = ? ORDER BY episode",
+                             conn, params=(stage,))
+
+
+def load_tokens(conn):
+    """Returns the episode URLs and a list of (2, n_tokens) token arrays from
+    the tokens stage.
+    """
+    df = get_stage(conn, "tokens")
+    return list(df["episode"]), [decode_tokens(content) for content in df["content"]]
+
+
+def load_corpus(conn):
+    """Returns a DataFrame with the same episode, transcript and
+    transcript_nouns columns as the cleaned transcripts used by model.py.
+    """
+    terms = vocab_terms(conn)
+    episodes, tokens = load_tokens(conn)
+    return pd.DataFrame({"episode": episodes,
+                         "transcript": [" ".join(terms[ids]) for ids, _ in tokens],
+                         "transcript_nouns": [" ".join(terms[ids[is_noun == 1]]) for ids, is_noun in tokens]})
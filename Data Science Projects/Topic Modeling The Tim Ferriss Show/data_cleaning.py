@@ -1,17 +1,42 @@
 """
 This script cleans and processes the text data for the Tim Ferriss Show
-transcripts and pickles the cleaned DataFrame.
+transcripts and stores the tokens in the document store (corpus_store.py).
+Only transcripts that changed since the last run are processed.
+
+Each transcript is normalized in two regex passes and parsed once by SpaCy,
+which provides both the lemma and the part of speech of every token.
 """
 
 import re
 import string
+import time
 import pandas as pd
+import corpus_store
 from nltk import word_tokenize, pos_tag
 import spacy
 
+BRACKET_PATTERN = re.compile(r'\[.*?\]')
+
+# Punctuation counts as part of a word so a word with digits is removed whole,
+# the same as removing punctuation first and then the word. Bracketed text is
+# removed by BRACKET_PATTERN first, so any bracket left is a stray one that
+# joins the words around it.
+CLEAN_PATTERN = re.compile(r'[\w{0}]*\d[\w{0}]*|[{0}\xa0‘’“”…]|\n'.format(re.escape(string.punctuation)))
+
 
 def clean_text(text):
-    """Cleans a document of text with a variety of pre-processing techniques.
+    """Cleans a document of text with a variety of pre-processing techniques
+    in two passes: removes bracketed text, then punctuation, words containing
+    digits, non-breaking spaces and curly quotes, and turns newlines into spaces.
+    """
+    text = BRACKET_PATTERN.sub('', text.lower())
+    return CLEAN_PATTERN.sub(lambda m: ' ' if m.group() == '\n' else '', text)
+
+
+def clean_text_legacy(text):
+    """The original multi-pass version of clean_text(), kept to check the
+    two-pass version against in tests/test_data_cleaning.py and
+    equivalence_report().
     """
     text = text.lower()
     text = re.sub('\[.*?\]', '', text)
@@ -24,13 +49,105 @@ def clean_text(text):
     return text
 
 
+NLP = None
+CHUNK_LENGTH = 100000
+
+
+def load_nlp():
+    """Loads the SpaCy english pipeline once and reuses it on later calls.
+    """
+    global NLP
+    if NLP is None:
+        NLP = spacy.load('en', disable=['parser', 'ner'])
+    return NLP
+
+
+def chunk_text(text, max_length=CHUNK_LENGTH):
+    """Splits a document into chunks of at most max_length characters,
+    breaking on whitespace so no word is cut in half.
+    """
+    chunks = []
+    while len(text) > max_length:
+        split = text.rfind(' ', 0, max_length)
+        split = split if split > 0 else max_length
+        chunks.append(text[:split])
+        text = text[split:]
+    chunks.append(text)
+    return chunks
+
+
+def parse_all(texts, batch_size=16, n_process=1):
+    """Parses a list of documents by streaming them through the SpaCy english
+    pipeline with nlp.pipe. Long documents are split into chunks under the
+    pipeline's max_length and joined back together. Prints the throughput in
+    documents and tokens per second.
+
+    Args:
+        texts -- (list) a list of documents
+        batch_size -- (int) the number of chunks SpaCy processes per batch
+        n_process -- (int) the number of processes SpaCy uses
+
+    Returns:
+        parsed -- (list) a (lemmas, is_noun) pair of lists for each document
+    """
+    nlp = load_nlp()
+    chunks, owners = [], []
+    for i, text in enumerate(texts):
+        for chunk in chunk_text(text, min(nlp.max_length, CHUNK_LENGTH)):
+            chunks.append(chunk)
+            owners.append(i)
+
+    start = time.time()
+    parsed, num_tokens = [([], []) for _ in texts], 0
+    for owner, doc in zip(owners, nlp.pipe(chunks, batch_size=batch_size, n_process=n_process)):
+        lemmas, is_noun = parsed[owner]
+        for token in doc:
+            if not token.is_space:
+                lemmas.append(token.lemma_)
+                is_noun.append(token.tag_[:2] == 'NN')
+        num_tokens += len(doc)
+    elapsed = max(time.time() - start, 1e-9)
+
+    print('Parsed {} docs: {:.2f} docs/sec, {:.0f} tokens/sec'.format(
+        len(texts), len(texts) / elapsed, num_tokens / elapsed))
+    return parsed
+
+
+def lemmatize_all(texts, batch_size=16, n_process=1):
+    """Lemmatizes a list of documents with parse_all().
+    """
+    return [' '.join(lemmas) for lemmas, _ in parse_all(texts, batch_size, n_process)]
+
+
+def tokenize_all(texts, conn, batch_size=16, n_process=1):
+    """Cleans and parses a list of documents and returns each as the encoded
+    token array stored in the tokens stage: the term IDs of its lemmas and a
+    flag marking the nouns.
+
+    Args:
+        texts -- (list) a list of raw documents
+        conn -- (Connection) a connection to the document store for term IDs
+        batch_size -- (int) the number of chunks SpaCy processes per batch
+        n_process -- (int) the number of processes SpaCy uses
+    """
+    parsed = parse_all([clean_text(text) for text in texts], batch_size, n_process)
+    ids = corpus_store.term_ids(conn, (lemma for lemmas, _ in parsed for lemma in lemmas))
+    return [corpus_store.encode_tokens([ids[lemma] for lemma in lemmas], is_noun)
+            for lemmas, is_noun in parsed]
+
+
 def lemmatize(text):
     """Takes in a document of text and lemmatizes each word using the
     SpaCy english lemmatizer.
     """
-    nlp = spacy.load('en', disable=['parser', 'ner'])
-    doc = nlp(text)
-    return ' '.join([token.lemma_ for token in doc])
+    return lemmatize_all([text])[0]
+
+
+def lemmatize_legacy(text):
+    """The original lemmatize(), which parses one whole document with a direct
+    SpaCy call, kept to check parse_all() against.
+    """
+    return ' '.join([token.lemma_ for token in load_nlp()(text)])
 
 
 def nouns(text):
@@ -42,15 +159,41 @@ def nouns(text):
     return ' '.join(all_nouns)
 
 
-def main():
-    """Uses all helper functions to take the DataFrame of episode text from web_scraping.py
-    and clean the text before pickling the cleaned DataFrame.
+def equivalence_report(texts):
+    """Compares the new cleaning and tagging against the original
+    clean_text_legacy(), lemmatize_legacy() and NLTK nouns() outputs on sample
+    transcripts. Returns a DataFrame with, for each document, whether the
+    cleaned text and lemmas match and the overlap of the noun sets.
+    """
+    rows = []
+    for text in texts:
+        legacy_clean = clean_text_legacy(text)
+        legacy_lemmas = lemmatize_legacy(legacy_clean)
+        legacy_nouns = set(nouns(legacy_lemmas).split())
+        (lemmas, is_noun), = parse_all([clean_text(text)])
+        fused_nouns = {lemma for lemma, noun in zip(lemmas, is_noun) if noun}
+        rows.append({'clean_text_equal': clean_text(text) == legacy_clean,
+                     'lemmas_equal': lemmas == legacy_lemmas.split(),
+                     'noun_jaccard': (len(fused_nouns & legacy_nouns) / len(fused_nouns | legacy_nouns)
+                                      if fused_nouns | legacy_nouns else 1.0)})
+    return pd.DataFrame(rows)
+
+
+def main(batch_size=16, n_process=1):
+    """Uses all helper functions to take the episode text stored by web_scraping.py
+    and clean the text of new or changed episodes before storing it.
+
+    Args:
+        batch_size -- (int) the number of chunks SpaCy processes per batch
+        n_process -- (int) the number of processes SpaCy uses
     """
-    df = pd.read_pickle('tfs_transcripts.pkl')
-    df['transcript'] = df['transcript'].apply(clean_text)
-    df['transcript'] = df['transcript'].apply(lemmatize)
-    df['transcript_nouns'] = df['transcript'].apply(nouns)
-    df.to_pickle('tfs_transcripts_cleaned.pkl')
+    conn = corpus_store.connect()
+    processed = corpus_store.run_stage(conn, 'raw', 'tokens',
+                                       lambda texts: tokenize_all(texts, conn, batch_size, n_process),
+                                       batch_size=batch_size * max(n_process, 1) * 4)
+    conn.close()
+    print('Cleaned and tokenized {} transcripts'.format(processed))
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -5,18 +5,29 @@ to find similar episodes.
 
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import json
+import os
+import numpy as np
 import pandas as pd
 import nltk
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from gensim import matutils, models, corpora
-import scipy.sparse
 import random
+from similarity_index import SimilarityIndex
 
+PREPROCESSOR_PATH = 'tfs_preprocessor.json'
+PREPROCESSOR_VERSION = 1
+CORPUS_PATH = 'tfs_corpus.mm'
+MODEL_PATH = 'tfs_lda.model'
+TOPICS_PATH = 'tfs_topics.npy'
 
+
+@lru_cache(maxsize=None)
 def stop_words():
     """Adds additional stop words found during modelling to the standard
-    nltk english stop word list.
+    nltk english stop word list. The set is built once and cached.
     """
     stop_words = nltk.corpus.stopwords.words('english')
     add_stop_words = ['tim', 'ferriss', 'just', 'really',
@@ -24,105 +35,285 @@ def stop_words():
                       'yeah', 'say', 'go', 'like', 'get',
                       'ryan', 'holiday', 'peter', 'attia',
                       'kevin', 'rose', 'kelly', '-PRON-',
-                      'joe', 'paul', 'david', 'john', 'bill'
-                      'chip', 'michael', 'chip', 'scott', 'richard'
-                      'josh', 'bill', 'mark', 'jim',
+                      'joe', 'paul', 'david', 'john', 'bill',
+                      'chip', 'michael', 'scott', 'richard',
+                      'josh', 'mark', 'jim',
                       'oh', 'matt', 'mullenweg', 'mike', 'james',
                       'robin', 'dr', 'dude', 'robbin']
 
-    stop_words.extend(add_stop_words)
-    return stop_words
+    return frozenset(stop_words + add_stop_words)
 
 
-def doc_term_matrix(df, stop_words, min_df, max_df):
-    """Creates a term-document matrix using the DataFrame of episode text for
-    the Tim Ferriss Show.
+def doc_term_matrix(df, stop_words, min_df, max_df, preprocessor_path=PREPROCESSOR_PATH):
+    """Creates a sparse document-term matrix using the DataFrame of episode text for
+    the Tim Ferriss Show and saves the preprocessing artifact with
+    save_preprocessor().
 
     Args:
         df -- (DataFrame) a DataFrame of text for transcripts of the Tim Ferriss Show
-        stop_words -- (list) a list of stop words to be removed from the corpus
+        stop_words -- (set) a set of stop words to be removed from the corpus
         min_df -- (float) the minimum document frequency for CountVectorizer
         max_df -- (float) the maximum document frequency for CountVectorizer
+        preprocessor_path -- (str) the path to save the preprocessing artifact to
 
     Returns:
-        tdm (DataFrame) -- a term-document matrix of episode text
+        dtm (csr_matrix) -- a sparse document-term matrix of episode text, with rows
+            in the same order as df
         id2word (dictionary) a dictionary of terms used for LDA modelling
     """
 
-    cv = CountVectorizer(stop_words=stop_words, min_df=min_df, max_df=max_df)
+    cv = CountVectorizer(stop_words=sorted(stop_words), min_df=min_df, max_df=max_df)
+
+    # Fit to the DataFrame column to create a sparse Document-Term Matrix
+    dtm = cv.fit_transform(df['transcript_nouns']).tocsr()
 
-    # Fit to the DataFrame column to create Document-Term Matrix
-    data_cv = cv.fit_transform(df['transcript_nouns'])
-    dtm = pd.DataFrame(data_cv.toarray(), columns=cv.get_feature_names())
-    dtm.index = df['episode']
+    vocabulary = {term: int(i) for term, i in cv.vocabulary_.items()}
+    save_preprocessor(stop_words, vocabulary, min_df, max_df, preprocessor_path)
 
-    # Transpose to create Term-Document Matrix
-    id2word = dict((v, k) for k, v in cv.vocabulary_.items())
+    id2word = dict((v, k) for k, v in vocabulary.items())
     return dtm, id2word
 
 
-def create_corpus(dtm):
-    """Creates a word corpus from a document term matrix.
+def save_preprocessor(stop_words, vocabulary, min_df, max_df, preprocessor_path=PREPROCESSOR_PATH):
+    """Saves the preprocessing artifact: the frozen stop words, the fitted
+    vocabulary and the min_df/max_df it was fit with, tagged with
+    PREPROCESSOR_VERSION.
+    """
+    artifact = {'version': PREPROCESSOR_VERSION,
+                'stop_words': sorted(stop_words),
+                'min_df': min_df,
+                'max_df': max_df,
+                'vocabulary': vocabulary}
+    with open(preprocessor_path + '.tmp', 'w') as f:
+        json.dump(artifact, f)
+    os.replace(preprocessor_path + '.tmp', preprocessor_path)
+    load_preprocessor.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def load_preprocessor(preprocessor_path=PREPROCESSOR_PATH):
+    """Loads the preprocessing artifact saved by doc_term_matrix() and returns
+    it as a dictionary with a ready to use 'vectorizer' added, a CountVectorizer
+    with the saved vocabulary that transforms new documents without refitting.
+    The artifact is cached after the first load.
+
+    Raises:
+        ValueError: The artifact was saved with a different PREPROCESSOR_VERSION.
+    """
+    with open(preprocessor_path) as f:
+        artifact = json.load(f)
+    if artifact.get('version') != PREPROCESSOR_VERSION:
+        raise ValueError('Preprocessor {} has version {}, expected {}'.format(
+            preprocessor_path, artifact.get('version'), PREPROCESSOR_VERSION))
+
+    artifact['stop_words'] = frozenset(artifact['stop_words'])
+    artifact['vectorizer'] = CountVectorizer(vocabulary=artifact['vocabulary'])
+    return artifact
+
+
+def load_vocabulary(preprocessor_path=PREPROCESSOR_PATH):
+    """Loads the vocabulary saved by doc_term_matrix() as an id2word dictionary.
+    """
+    return dict((v, k) for k, v in load_preprocessor(preprocessor_path)['vocabulary'].items())
+
+
+def transform_documents(df, preprocessor_path=PREPROCESSOR_PATH):
+    """Creates a sparse document-term matrix for new episodes using the saved
+    vocabulary, so term IDs match the ones the LDA model was trained on.
+    """
+    return load_preprocessor(preprocessor_path)['vectorizer'].transform(df['transcript_nouns']).tocsr()
+
+
+def create_corpus(dtm, corpus_path=CORPUS_PATH):
+    """Serializes a sparse document-term matrix to disk in Matrix Market format
+    and returns a corpus that streams documents from that file, so LDA never
+    needs the whole corpus in memory.
     """
-    tdm = dtm.transpose()
-    sparse_counts = scipy.sparse.csr_matrix(tdm)
-    corpus = matutils.Sparse2Corpus(sparse_counts)
-    return corpus
+    corpora.MmCorpus.serialize(corpus_path, matutils.Sparse2Corpus(dtm, documents_columns=False))
+    return corpora.MmCorpus(corpus_path)
 
 
-def lda_model(df, stop_words, min_df, max_df, num_topics, passes):
+def lda_model(df, stop_words, min_df, max_df, num_topics, passes, workers=None, model_path=MODEL_PATH):
     """Takes in a DataFrame of text for transcripts from The Tim Ferriss Show and
     returns an LDA model fit to that text that can be used for Topic modeling.
+    The model is saved to model_path so new episodes can be folded in later
+    with update_lda_model().
+
+    Args:
+        workers -- (int) the number of worker processes for LdaMulticore, or
+            None to train on a single core with LdaModel
+        model_path -- (str) the path to save the trained model to
     """
     dtm, id2word = doc_term_matrix(df, stop_words, min_df, max_df)
     corpus = create_corpus(dtm)
 
-    model = models.LdaModel(corpus=corpus, id2word=id2word, num_topics=num_topics, passes=passes)
+    if workers:
+        model = models.LdaMulticore(corpus=corpus, id2word=id2word, num_topics=num_topics,
+                                    passes=passes, workers=workers)
+    else:
+        model = models.LdaModel(corpus=corpus, id2word=id2word, num_topics=num_topics, passes=passes)
+    model.save(model_path)
     return model, corpus
 
 
-def topics_df(model, corpus):
-    """Maps topics back to episodes in a DataFrame with their respective weights.
-    Adds zero weighting for topics that do not apply to a certain episode in order to
-    fill in all rows/columns for the DataFrame.
+def update_lda_model(df, model_path=MODEL_PATH, preprocessor_path=PREPROCESSOR_PATH):
+    """Folds new episodes into a saved LDA model with an online update instead
+    of retraining from scratch, then saves the updated model.
+
+    Args:
+        df -- (DataFrame) a DataFrame of the new episodes' transcript_nouns
+        model_path -- (str) the path of the saved model
+        preprocessor_path -- (str) the path of the preprocessing artifact the model
+            was trained with
+
+    Returns:
+        model -- (LdaModel) the updated model
     """
+    model = models.LdaModel.load(model_path)
+    model.update(matutils.Sparse2Corpus(transform_documents(df, preprocessor_path), documents_columns=False))
+    model.save(model_path)
+    return model
 
-    corpus_transformed = model[corpus]
-    topics_by_ep = dict(zip(df['episode'], list(corpus_transformed)))
 
-    for k, v in topics_by_ep.items():
-        if len(v) < 4:
-            topics = [item[0] for item in v]
-            if 0 not in topics:
-                v.append((0, 0.0))
-            if 1 not in topics:
-                v.append((1, 0.0))
-            if 2 not in topics:
-                v.append((2, 0.0))
-            if 3 not in topics:
-                v.append((3, 0.0))
-            v.sort(key=lambda x: x[0])
+def score_num_topics(num_topics, corpus_path, id2word, passes, texts=None):
+    """Trains an LDA model with num_topics topics on a serialized corpus and
+    returns its coherence. Uses c_v coherence when the tokenized texts are
+    given and u_mass coherence otherwise.
+    """
+    corpus = corpora.MmCorpus(corpus_path)
+    model = models.LdaModel(corpus=corpus, id2word=id2word, num_topics=num_topics, passes=passes)
+    if texts is None:
+        coherence = models.CoherenceModel(model=model, corpus=corpus, coherence='u_mass')
+    else:
+        coherence = models.CoherenceModel(model=model, texts=texts,
+                                          dictionary=corpora.Dictionary.from_corpus(corpus, id2word),
+                                          coherence='c_v')
+    return coherence.get_coherence()
+
 
-    df = pd.DataFrame(topics_by_ep)
-    df = df.transpose()
-    return df
+def topic_sweep(topic_counts, id2word, passes, corpus_path=CORPUS_PATH, texts=None, n_jobs=None):
+    """Trains one LDA model per number of topics in parallel processes and
+    scores each by coherence.
+
+    Args:
+        topic_counts -- (list) the numbers of topics to try
+        id2word -- (dictionary) a dictionary of terms used for LDA modelling
+        passes -- (int) the number of passes for each model
+        corpus_path -- (str) the path of the corpus saved by create_corpus()
+        texts -- (list) optional tokenized documents for c_v coherence
+        n_jobs -- (int) the number of worker processes, defaults to the number of CPUs
+
+    Returns:
+        scores (DataFrame) -- the coherence for each number of topics, best first
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(score_num_topics, num_topics, corpus_path, id2word, passes, texts)
+                   for num_topics in topic_counts]
+        coherences = [future.result() for future in futures]
 
+    scores = pd.DataFrame({'num_topics': list(topic_counts), 'coherence': coherences})
+    return scores.sort_values('coherence', ascending=False).reset_index(drop=True)
 
-def recommend_episode(episode_url):
-    """Takes in a data frame and an episode_url and returns a recommended episode
+
+# The model and corpus of a worker process of infer_topics(), set by init_worker()
+_worker = {}
+
+
+def init_worker(model_path, corpus_path):
+    """Loads the saved model and corpus once in each worker process of infer_topics().
+    """
+    _worker['model'] = models.LdaModel.load(model_path)
+    _worker['corpus'] = corpora.MmCorpus(corpus_path)
+
+
+def infer_batch(model, corpus, topics_path, start, end):
+    """Writes the normalized topic distributions of documents start to end of
+    a corpus into rows start to end of the topics array saved at topics_path.
+    In a worker process started by infer_topics(), model and corpus are None
+    and the ones loaded by init_worker() are used.
+    """
+    model = _worker['model'] if model is None else model
+    corpus = _worker['corpus'] if corpus is None else corpus
+    gamma, _ = model.inference([corpus[i] for i in range(start, end)])
+    topics = np.load(topics_path, mmap_mode='r+')
+    topics[start:end] = gamma / gamma.sum(axis=1, keepdims=True)
+    topics.flush()
+
+
+def infer_topics(model, corpus, batch_size=256, n_jobs=1, model_path=MODEL_PATH,
+                 corpus_path=CORPUS_PATH, topics_path=TOPICS_PATH):
+    """Infers the topic distribution of every document into a preallocated
+    (n_docs, num_topics) float32 array saved at topics_path, which can be
+    memory-mapped with load_topics(). Documents are inferred in batches, and
+    in parallel processes when n_jobs is more than 1. Each worker process loads
+    the model and corpus from model_path and corpus_path once, so model must be
+    the model saved at model_path and corpus the one serialized at corpus_path.
+
+    Args:
+        model -- (LdaModel) a trained LDA model
+        corpus -- (MmCorpus) the corpus to infer topics for
+        batch_size -- (int) the number of documents per batch
+        n_jobs -- (int) the number of worker processes
+        model_path -- (str) the path model was saved to
+        corpus_path -- (str) the path corpus was serialized to
+        topics_path -- (str) the path to save the topic array to
+
+    Returns:
+        topics (memmap) -- the document-topic probabilities
+    """
+    n_docs = len(corpus)
+    topics = np.lib.format.open_memmap(topics_path, mode='w+', dtype=np.float32,
+                                       shape=(n_docs, model.num_topics))
+    del topics
+    batches = [(start, min(start + batch_size, n_docs)) for start in range(0, n_docs, batch_size)]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker,
+                                 initargs=(model_path, corpus_path)) as executor:
+            futures = [executor.submit(infer_batch, None, None, topics_path, start, end)
+                       for start, end in batches]
+            for future in futures:
+                future.result()
+    else:
+        for start, end in batches:
+            infer_batch(model, corpus, topics_path, start, end)
+
+    return load_topics(topics_path)
+
+
+def load_topics(topics_path=TOPICS_PATH):
+    """Memory-maps the topic array saved by infer_topics() without reading it into RAM.
+    """
+    return np.load(topics_path, mmap_mode='r')
+
+
+def topics_df(model, corpus, episodes, **kwargs):
+    """Maps topics back to episodes in a DataFrame with their respective weights,
+    with one column per topic for any number of topics.
+
+    Args:
+        model -- (LdaModel) a trained LDA model
+        corpus -- (MmCorpus) the corpus the model was trained on
+        episodes -- (list) the episode URL of each document in the corpus
+        kwargs -- additional arguments for infer_topics()
+    """
+    return pd.DataFrame(infer_topics(model, corpus, **kwargs), index=list(episodes))
+
+
+def similarity_index(topics, k=5):
+    """Builds a SimilarityIndex from a DataFrame of topic weights indexed by
+    episode URL, such as the output of topics_df().
+    """
+    return SimilarityIndex(topics.index, topics.values, k=k)
+
+
+def recommend_episode(episode_url, index):
+    """Takes in a SimilarityIndex and an episode_url and returns a recommended episode
     by taking the five most similar episodes based on cosine similarity
     and choosing a random option.
     """
 
-    episodes = []
-    episode_idx = df[df['episode'] == episode_url].index.values.astype(int)[0]
-    topics = df.drop(['episode'], axis=1)
-    for i in range(df.shape[0]):
-        dist = cosine_similarity(topics.iloc[[episode_idx, i]])[0][1]
-        episodes.append((i, dist))
-
-    episodes = sorted(episodes, key = lambda x: x[1], reverse=True)
-    top_five = episodes[0:5]
-    rec_idx = random.choice(top_five)[0]
-    rec_url = df.iloc[rec_idx]['episode']
+    top_five = index.similar(episode_url)[0:5]
+    rec_url = random.choice(top_five)[0]
     print("I recommend you listen to the episode here next!: \n {}".format(rec_url))
+    return rec_url
@@ -0,0 +1,137 @@
+"""
+This module contains a similarity index over the topic weights of episodes of
+The Tim Ferriss Show, used by the recommender in model.py.
+
+The topic matrix is L2-normalized once so cosine similarity is a dot product.
+The top-k most similar episodes for every episode are computed with blocked
+matrix products and argpartition and stored in a neighbor table, so a lookup by
+episode URL is a dictionary access and a row read. New episodes can be inserted
+without rebuilding the table.
+"""
+
+import numpy as np
+
+
+def normalize(topics):
+    """Returns the rows of a topic matrix scaled to unit L2 norm as float32.
+    """
+    topics = np.atleast_2d(np.asarray(topics, dtype=np.float32))
+    norms = np.linalg.norm(topics, axis=1, keepdims=True)
+    return topics / np.where(norms == 0, 1, norms)
+
+
+class SimilarityIndex:
+    """Top-k cosine similarity index of episodes.
+
+    Attributes:
+        episodes: A list of episode URLs in row order.
+        positions: A dictionary mapping each episode URL to its row.
+        vectors: The L2-normalized topic matrix, shape (n_episodes, num_topics).
+        neighbors: The rows of the k most similar episodes for each episode, most
+            similar first. Padded with -1 when there are fewer than k other episodes.
+        scores: The cosine similarity of each neighbor, padded with -inf.
+    """
+
+    def __init__(self, episodes, topics, k=5, block_size=1024):
+        """Builds the index from a list of episode URLs and their topic weights.
+
+        Args:
+            episodes: A list of episode URLs.
+            topics: An array of topic weights with one row per episode.
+            k: The number of neighbors to keep for each episode.
+            block_size: The number of rows multiplied at once when building.
+        """
+        self.k = k
+        self.episodes = list(episodes)
+        self.positions = {episode: i for i, episode in enumerate(self.episodes)}
+        self.vectors = normalize(topics)
+        self.neighbors, self.scores = self.top_k(self.vectors, block_size)
+
+    def top_k(self, vectors, block_size):
+        """Returns the neighbor and score tables for a normalized topic matrix.
+        """
+        n = len(vectors)
+        neighbors = np.full((n, self.k), -1, dtype=np.int64)
+        scores = np.full((n, self.k), -np.inf, dtype=np.float32)
+        k = min(self.k, n - 1)
+        if k <= 0:
+            return neighbors, scores
+
+        for start in range(0, n, block_size):
+            sims = vectors[start:start + block_size] @ vectors.T
+            rows = np.arange(len(sims))
+            sims[rows, start + rows] = -np.inf
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            neighbors[start:start + len(sims), :k] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + len(sims), :k] = np.take_along_axis(top_scores, order, axis=1)
+        return neighbors, scores
+
+    def add(self, episode, topics):
+        """Inserts a new episode, computing its neighbors and updating the
+        neighbors of existing episodes it is now among the most similar to.
+
+        Args:
+            episode: The URL of the new episode.
+            topics: The topic weights of the new episode.
+
+        Raises:
+            ValueError: The episode is already in the index.
+        """
+        if episode in self.positions:
+            raise ValueError('Episode {} is already in the index'.format(episode))
+
+        vector = normalize(topics)
+        row = len(self.episodes)
+        sims = self.vectors @ vector[0]
+
+        new_neighbors = np.full((1, self.k), -1, dtype=np.int64)
+        new_scores = np.full((1, self.k), -np.inf, dtype=np.float32)
+        k = min(self.k, row)
+        if k > 0:
+            top = np.argsort(-sims)[:k]
+            new_neighbors[0, :k], new_scores[0, :k] = top, sims[top]
+
+        # Replace the weakest neighbor of every episode the new one beats, then re-sort those rows
+        beaten = np.where(sims > self.scores[:, -1])[0]
+        self.neighbors[beaten, -1] = row
+        self.scores[beaten, -1] = sims[beaten]
+        order = np.argsort(-self.scores[beaten], axis=1)
+        self.neighbors[beaten] = np.take_along_axis(self.neighbors[beaten], order, axis=1)
+        self.scores[beaten] = np.take_along_axis(self.scores[beaten], order, axis=1)
+
+        self.episodes.append(episode)
+        self.positions[episode] = row
+        self.vectors = np.vstack([self.vectors, vector])
+        self.neighbors = np.vstack([self.neighbors, new_neighbors])
+        self.scores = np.vstack([self.scores, new_scores])
+
+    def similar(self, episode):
+        """Returns a list of (episode URL, cosine similarity) tuples for the
+        most similar episodes to an episode, most similar first.
+
+        Raises:
+            KeyError: The episode is not in the index.
+        """
+        row = self.positions[episode]
+        return [(self.episodes[i], float(score))
+                for i, score in zip(self.neighbors[row], self.scores[row]) if i >= 0]
+
+    def save(self, path):
+        """Saves the index to a .npz file.
+        """
+        np.savez(path, episodes=np.array(self.episodes), vectors=self.vectors,
+                 neighbors=self.neighbors, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with save() without recomputing the neighbor table.
+        """
+        data = np.load(path)
+        index = cls.__new__(cls)
+        index.episodes = list(data['episodes'])
+        index.positions = {episode: i for i, episode in enumerate(index.episodes)}
+        index.vectors, index.neighbors, index.scores = data['vectors'], data['neighbors'], data['scores']
+        index.k = index.neighbors.shape[1]
+        return index
@@ -0,0 +1,69 @@
+"""Checks the two-pass clean_text() and the batched SpaCy parse against the
+original implementations kept in data_cleaning.py.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip('spacy')
+pytest.importorskip('nltk')
+data_cleaning = pytest.importorskip('data_cleaning')
+
+SAMPLES = [
+    'Tim Ferriss: Hello [00:01:02] and welcome!',
+    'see 2]then',
+    'footnote[1',
+    'x[2] y',
+    'a1[b] c',
+    '[a\nb] 3d-printing is “great”…',
+    'It’s 4:00\xa0a.m. in the 1990s\nand 10x-ing',
+    '',
+]
+
+NOUN_SAMPLES = [
+    'Tim Ferriss: My guest today is an author and investor who wrote three books about habits.',
+    'We talked about sleep, coffee, meditation and the morning routine of a chess champion.',
+    'The company raised money from investors in 2010 and sold the business to a bank.',
+]
+
+ALPHABET = 'aB1 2[]\n\xa0‘’“”…-.,:\'"_é²x'
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_clean_text_matches_legacy_samples(text):
+    assert data_cleaning.clean_text(text) == data_cleaning.clean_text_legacy(text)
+
+
+def test_clean_text_matches_legacy_fuzz():
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 14)))
+        assert data_cleaning.clean_text(text) == data_cleaning.clean_text_legacy(text), repr(text)
+
+
+def require_nlp():
+    try:
+        data_cleaning.load_nlp()
+    except OSError:
+        pytest.skip('SpaCy english model is not installed')
+
+
+def test_parse_all_matches_legacy_lemmas():
+    require_nlp()
+    texts = [data_cleaning.clean_text(text) for text in SAMPLES[:3]]
+    texts.append(data_cleaning.clean_text('the runners were running quickly ' * 50))
+    lemmas = data_cleaning.lemmatize_all(texts)
+    # parse_all() drops whitespace tokens, which the legacy join kept
+    assert [doc.split() for doc in lemmas] == [data_cleaning.lemmatize_legacy(text).split() for text in texts]
+
+
+def test_equivalence_report_nouns_overlap_nltk():
+    require_nlp()
+    try:
+        report = data_cleaning.equivalence_report(SAMPLES + NOUN_SAMPLES)
+    except LookupError:
+        pytest.skip('NLTK tokenizer or tagger data is not installed')
+
+    assert report['clean_text_equal'].all()
+    assert report['noun_jaccard'].mean() >= 0.6
@@ -0,0 +1,110 @@
+"""Tests for fetching transcripts against a local HTTP server that answers
+conditional requests with 304 Not Modified.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('bs4')
+pytest.importorskip('requests')
+web_scraping = pytest.importorskip('web_scraping')
+
+EPISODE = '<html><body><div class="entry-content"><p>Episode {}</p></div></body></html>'
+
+
+class Site:
+    """Pages served by the fixture server and a log of the requests it got."""
+
+    def __init__(self):
+        self.pages = {'/one': ('"v1"', EPISODE.format(1)),
+                      '/two': ('"v1"', EPISODE.format(2)),
+                      '/no-content': ('"v1"', '<html><body><p>Moved</p></body></html>')}
+        self.requests = []
+
+
+@pytest.fixture
+def site():
+    site = Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site.requests.append((self.path, self.headers.get('If-None-Match')))
+            if self.path not in site.pages:
+                self.send_error(404)
+                return
+            etag, body = site.pages[self.path]
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', 'Thu, 20 Sep 2018 00:00:00 GMT')
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('localhost', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site.url = 'http://localhost:{}'.format(server.server_address[1])
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+def test_cached_page_is_not_requested_again(site, tmp_path):
+    session = web_scraping.get_session(1)
+    url = site.url + '/one'
+
+    assert 'Episode 1' in web_scraping.fetch_html(url, session, str(tmp_path))
+    assert 'Episode 1' in web_scraping.fetch_html(url, session, str(tmp_path))
+    assert site.requests == [('/one', None)]
+
+
+def test_revalidate_uses_etag_and_304(site, tmp_path):
+    session = web_scraping.get_session(1)
+    url = site.url + '/one'
+    web_scraping.fetch_html(url, session, str(tmp_path))
+
+    assert 'Episode 1' in web_scraping.fetch_html(url, session, str(tmp_path), revalidate=True)
+    assert site.requests[-1] == ('/one', '"v1"')
+
+    site.pages['/one'] = ('"v2"', EPISODE.format('1 updated'))
+    assert 'Episode 1 updated' in web_scraping.fetch_html(url, session, str(tmp_path), revalidate=True)
+    assert 'Episode 1 updated' in web_scraping.fetch_html(url, session, str(tmp_path))
+
+
+def test_revalidate_without_headers_file(site, tmp_path):
+    session = web_scraping.get_session(1)
+    url = site.url + '/one'
+    web_scraping.fetch_html(url, session, str(tmp_path))
+    os.remove(web_scraping.cache_paths(url, str(tmp_path))[1])
+
+    assert 'Episode 1' in web_scraping.fetch_html(url, session, str(tmp_path), revalidate=True)
+    assert site.requests[-1] == ('/one', None)
+
+
+def test_fetch_all_skips_failed_urls(site, tmp_path):
+    urls = [site.url + '/one', site.url + '/missing', site.url + '/two']
+
+    pages, failed = web_scraping.fetch_all(urls, max_workers=2, cache_dir=str(tmp_path))
+    assert set(pages) == {urls[0], urls[2]}
+    assert set(failed) == {urls[1]}
+
+
+def test_text_to_list_skips_unparseable_pages(site, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    urls = [site.url + '/one', site.url + '/no-content', site.url + '/missing', site.url + '/two']
+
+    texts = web_scraping.text_to_list(urls)
+    assert texts[1] is None and texts[2] is None
+    assert 'Episode 1' in texts[0] and 'Episode 2' in texts[3]
@@ -1,13 +1,140 @@
 """
 This script scrapes episodes of The Tim Ferriss show from the blog that they are housed
-(tim.blog) and creates and pickles a DataFrame of the episode text.
+(tim.blog) and stores the episode text in the document store (corpus_store.py).
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
 from urllib.request import urlopen
-from bs4 import BeautifulSoup
-import pandas as pd
+from bs4 import BeautifulSoup, SoupStrainer
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import corpus_store
 
 BASE = "https://tim.blog/2018/09/20/all-transcripts-from-the-tim-ferriss-show/"
+CACHE_DIR = "transcript_cache"
+MAX_WORKERS = 8
+
+
+def get_session(max_workers=MAX_WORKERS, retries=3):
+    """Returns a requests Session with a connection pool for every worker and
+    retries with exponential backoff on connection errors and 429/5xx responses.
+
+    Args:
+        max_workers -- (int) the number of threads sharing the session
+        retries -- (int) the number of times to retry each url
+    """
+    retry = Retry(total=retries, backoff_factor=1.0,
+                  status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def cache_paths(url, cache_dir=CACHE_DIR):
+    """Returns the paths of the cached html and the cached response headers
+    for a URL.
+    """
+    key = os.path.join(cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+    return key + ".html", key + ".json"
+
+
+def fetch_html(url, session, cache_dir=CACHE_DIR, revalidate=False):
+    """Returns the raw html of a URL, using the on-disk cache when possible.
+
+    Cached pages are returned without a request unless revalidate is True, in
+    which case a conditional request is sent with the cached ETag and
+    Last-Modified headers and the page is only downloaded again if it changed.
+    A cached page without its headers file is requested without validators.
+
+    Args:
+        url -- (str) a url to fetch
+        session -- (Session) a requests Session to fetch the url with
+        cache_dir -- (str) the directory holding cached pages
+        revalidate -- (bool) whether to check cached pages for changes
+    """
+    html_path, headers_path = cache_paths(url, cache_dir)
+    headers = {}
+    if os.path.exists(html_path):
+        if not revalidate:
+            with open(html_path, encoding="utf-8") as f:
+                return f.read()
+        cached = {}
+        if os.path.exists(headers_path):
+            with open(headers_path) as f:
+                cached = json.load(f)
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    r = session.get(url, headers=headers, timeout=30)
+    if r.status_code == 304:
+        with open(html_path, encoding="utf-8") as f:
+            return f.read()
+    r.raise_for_status()
+
+    # Write to temp files first so an interrupted run never leaves a partial page
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(html_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(r.text)
+    with open(headers_path + ".tmp", "w") as f:
+        json.dump({"url": url, "etag": r.headers.get("ETag"),
+                   "last_modified": r.headers.get("Last-Modified")}, f)
+    os.replace(html_path + ".tmp", html_path)
+    os.replace(headers_path + ".tmp", headers_path)
+    return r.text
+
+
+def fetch_all(urls, max_workers=MAX_WORKERS, cache_dir=CACHE_DIR, revalidate=False):
+    """Fetches a list of URLs with a bounded pool of threads sharing one
+    session. A URL that still fails after its retries is reported and skipped
+    rather than aborting the run.
+
+    Args:
+        urls -- (list) a list of urls to fetch
+        max_workers -- (int) the maximum number of concurrent requests
+        cache_dir -- (str) the directory holding cached pages
+        revalidate -- (bool) whether to check cached pages for changes
+
+    Returns:
+        pages -- (dict) the html of each url that was fetched
+        failed -- (dict) the exception raised for each url that failed
+    """
+    session = get_session(max_workers)
+
+    def fetch(url):
+        try:
+            return url, fetch_html(url, session, cache_dir, revalidate), None
+        except Exception as e:
+            return url, None, e
+
+    pages, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for url, page, error in executor.map(fetch, urls):
+            if error is None:
+                pages[url] = page
+            else:
+                print("Unable to fetch {}: {}".format(url, error))
+                failed[url] = error
+    session.close()
+    return pages, failed
+
+
+def parse_text(page):
+    """Extracts the episode text from the html of a tim.blog page. Only the
+    entry-content div is parsed.
+
+    Args:
+        page -- (str) the html of an episode page
+    """
+    soup = BeautifulSoup(page, "html.parser", parse_only=SoupStrainer("div", {"class": "entry-content"}))
+    return soup.findAll("div", {"class": "entry-content"})[0].text
 
 
 def extract_text(url):
@@ -16,10 +143,7 @@ def extract_text(url):
     Args:
         url -- (str) a url to scrape episode text from
     """
-    page = urlopen(url)
-    soup = BeautifulSoup(page, "html.parser")
-    episode_text = soup.findAll("div", {"class": "entry-content"})[0].text
-    return episode_text
+    return parse_text(fetch_html(url, requests.Session()))
 
 
 def extract_urls(base_url):
@@ -53,34 +177,44 @@ def podcast_urls(extracted_urls):
 
 def text_to_list(urls):
     """Extracts the text for the podcast transcript from a list of links
-    to each transcript.
+    to each transcript. Transcripts are fetched concurrently and served from
+    the cache when already downloaded. Transcripts that could not be fetched
+    or parsed are reported and are None.
     """
-    text_list = []
+    pages, _ = fetch_all(urls)
+    texts = []
     for url in urls:
-        extract = extract_text(url)
-        text_list.append(extract)
-    return text_list
+        text = None
+        if url in pages:
+            try:
+                text = parse_text(pages[url])
+            except Exception as e:
+                print("Unable to parse {}: {!r}".format(url, e))
+        texts.append(text)
+    return texts
 
 
 def create_corpus(podcast_urls, transcripts):
-    """Creates a DataFrame with the text of each transcript and the link
-    to the corresponding episode. Pickles the DataFrame after.
+    """Stores the text of each transcript keyed by the link to the
+    corresponding episode in the document store. Only new or changed
+    transcripts are written.
     """
-    df = pd.DataFrame([podcast_urls, transcripts]).transpose()
-    df.columns = ['episode', 'transcript']
-    df = df.reset_index().drop(['index'], axis=1)
-    df.to_pickle('tfs_transcripts.pkl')
+    conn = corpus_store.connect()
+    written = corpus_store.put_new(conn, "raw", zip(podcast_urls, transcripts))
+    conn.close()
+    print("Stored {} new or changed transcripts".format(written))
 
 
 def main():
-    """Calls all internal functions to create a pickled DataFrame of
-    Tim Ferriss Show episode text.
+    """Calls all internal functions to store the Tim Ferriss Show episode text.
     """
 
     extracted_urls = extract_urls(BASE)
     podcasts = podcast_urls(extracted_urls)
     transcripts = text_to_list(podcasts)
-    create_corpus(podcasts, transcripts)
+    fetched = [(url, text) for url, text in zip(podcasts, transcripts) if text is not None]
+    create_corpus([url for url, _ in fetched], [text for _, text in fetched])
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Keeps track of which Twitch users the crawl in data.py has seen and which to crawl next.
+
+Twitch user IDs are numeric strings, so the seen-filter stores them as bits in a
+bitmap split into fixed size chunks that are allocated on first use. Its memory
+is bounded by the range of IDs instead of growing with every user added, and it
+is exact, so no user is skipped by mistake. IDs that are not numeric fall back
+to an ordinary set.
+
+The frontier counts how many crawled users follow each channel (its in-degree
+within the crawl) and queues the next level in order of in-degree, keeping only
+the top-N channels when the level has a budget. The API calls are spent on the
+most followed channels first, which are the ones that matter for recommendations.
+
+With a capacity, in-degrees are counted in a fixed size count-min sketch and only
+the capacity channels with the highest estimated counts are kept by ID, so the
+counts stay the same size however many distinct channels are followed. Estimates
+can only over-count, by at most a small share of all follows counted.
+"""
+
+from array import array
+import heapq
+from operator import itemgetter
+
+# Number of IDs covered by each chunk of the seen-filter bitmap (128 KB per chunk)
+CHUNK_BITS = 1 << 20
+
+# Counters per row and number of rows of the count-min sketch (16 MB in total)
+SKETCH_WIDTH = 1 << 20
+SKETCH_DEPTH = 4
+
+
+def to_int(user_id):
+    """Returns a user ID as an int, or None if it is not a non-negative integer.
+    """
+    user_id = str(user_id)
+    return int(user_id) if user_id.isdigit() else None
+
+
+def key_of(user_id):
+    """Returns the key a user ID is counted under, an int when it is numeric.
+    """
+    key = to_int(user_id)
+    return str(user_id) if key is None else key
+
+
+class SeenFilter:
+    """Exact set of user IDs stored as a chunked bitmap.
+
+    Attributes:
+        chunk_bits: The number of IDs covered by each chunk.
+        chunks: A dictionary of chunk number to the bytearray of its bits.
+        other: A set of the IDs that are not numeric.
+    """
+
+    def __init__(self, chunk_bits=CHUNK_BITS):
+        """Inits an empty SeenFilter.
+
+        Args:
+            chunk_bits: The number of IDs covered by each chunk, a multiple of 8.
+        """
+        self.chunk_bits = chunk_bits
+        self.chunks = {}
+        self.other = set()
+        self.count = 0
+
+    def __contains__(self, user_id):
+        n = to_int(user_id)
+        if n is None:
+            return str(user_id) in self.other
+        chunk = self.chunks.get(n // self.chunk_bits)
+        if chunk is None:
+            return False
+        bit = n % self.chunk_bits
+        return bool(chunk[bit >> 3] & (1 << (bit & 7)))
+
+    def add(self, user_id):
+        """Adds a user ID to the filter."""
+        n = to_int(user_id)
+        if n is None:
+            if str(user_id) not in self.other:
+                self.other.add(str(user_id))
+                self.count += 1
+            return
+        chunk = self.chunks.get(n // self.chunk_bits)
+        if chunk is None:
+            chunk = self.chunks[n // self.chunk_bits] = bytearray(self.chunk_bits // 8)
+        bit = n % self.chunk_bits
+        mask = 1 << (bit & 7)
+        if not chunk[bit >> 3] & mask:
+            chunk[bit >> 3] |= mask
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        """Returns the number of bytes used by the bitmap chunks."""
+        return len(self.chunks) * self.chunk_bits // 8
+
+
+class CountMinSketch:
+    """Approximate counts of keys in a fixed amount of memory.
+
+    Attributes:
+        width: The number of counters in each row.
+        rows: A list of depth arrays of counters, each indexed by a different hash.
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        """Inits a CountMinSketch with every counter at zero."""
+        self.width = width
+        self.rows = [array('I', [0]) * width for _ in range(depth)]
+
+    def add(self, key):
+        """Adds one to the count of a key and returns its new estimated count."""
+        estimate = None
+        for seed, row in enumerate(self.rows):
+            i = hash((seed, key)) % self.width
+            row[i] += 1
+            estimate = row[i] if estimate is None else min(estimate, row[i])
+        return estimate
+
+
+class Frontier:
+    """Priority queue of users to crawl, ordered by in-degree within the crawl.
+
+    Attributes:
+        capacity: The number of users whose in-degree is kept, or None to count
+            every user exactly.
+        in_degree: A dictionary of user ID to the number of crawled users following
+            it. Holds at most capacity users, with estimated counts, when capacity is set.
+        heap: The queue of the current level as a heap of (-in-degree, user ID string) tuples.
+    """
+
+    def __init__(self, capacity=None, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        """Inits an empty Frontier.
+
+        Args:
+            capacity: The number of users with the highest in-degree to keep, or
+                None to count every user exactly. Should be larger than any level budget.
+            width, depth: The size of the count-min sketch used when capacity is set.
+        """
+        self.capacity = capacity
+        self.in_degree = {}
+        self.heap = []
+        self.sketch = CountMinSketch(width, depth) if capacity is not None else None
+        self.smallest = []
+
+    def count(self, user_ids):
+        """Adds one to the in-degree of every user ID in an iterable."""
+        in_degree = self.in_degree
+        for user_id in user_ids:
+            key = key_of(user_id)
+            if self.sketch is None:
+                in_degree[key] = in_degree.get(key, 0) + 1
+                continue
+
+            estimate = self.sketch.add(key)
+            if key not in in_degree and len(in_degree) >= self.capacity:
+                if estimate <= self.min_tracked():
+                    continue
+                del in_degree[heapq.heappop(self.smallest)[1]]
+            in_degree[key] = estimate
+            heapq.heappush(self.smallest, (estimate, key))
+
+            # Every change of a count adds a heap entry, so drop the outdated ones now and then
+            if len(self.smallest) > 4 * self.capacity:
+                self.rebuild_smallest()
+
+    def rebuild_smallest(self):
+        """Rebuilds the heap of kept users from in_degree."""
+        self.smallest = [(degree, key) for key, degree in self.in_degree.items()]
+        heapq.heapify(self.smallest)
+
+    def min_tracked(self):
+        """Returns the smallest in-degree kept, dropping outdated heap entries."""
+        while self.smallest and self.in_degree.get(self.smallest[0][1]) != self.smallest[0][0]:
+            heapq.heappop(self.smallest)
+        return self.smallest[0][0]
+
+    def start_level(self, seen, budget=None, user_ids=None):
+        """Replaces the queue with the next level of users to crawl.
+
+        Users already seen are dropped from the in-degree counts, so the counts
+        only hold users that can still be queued.
+
+        Args:
+            seen: A SeenFilter of the users already crawled.
+            budget: The number of users with the highest in-degree to queue, or
+                None to queue all of them.
+            user_ids: The users to queue. Defaults to every counted user not seen.
+
+        Returns:
+            The number of users queued.
+        """
+        for key in [key for key in self.in_degree if key in seen]:
+            del self.in_degree[key]
+        if self.sketch is not None:
+            self.rebuild_smallest()
+
+        if user_ids is None:
+            candidates = self.in_degree.items()
+        else:
+            keys = {key_of(user_id) for user_id in user_ids}
+            candidates = [(key, self.in_degree.get(key, 0)) for key in keys if key not in seen]
+
+        if budget is not None:
+            candidates = heapq.nlargest(budget, candidates, key=itemgetter(1))
+        self.heap = [(-degree, str(key)) for key, degree in candidates]
+        heapq.heapify(self.heap)
+        return len(self.heap)
+
+    def pop(self):
+        """Removes and returns the queued user ID with the highest in-degree.
+
+        Raises:
+            IndexError: The queue is empty.
+        """
+        return heapq.heappop(self.heap)[1]
+
+    def queued(self):
+        """Returns a list of the queued user IDs, highest in-degree first."""
+        return [user_id for _, user_id in sorted(self.heap)]
+
+    def __len__(self):
+        return len(self.heap)
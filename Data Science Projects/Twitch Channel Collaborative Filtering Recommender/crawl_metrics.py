@@ -0,0 +1,224 @@
+"""Collects live metrics for the Twitch API crawl in data.py.
+
+The crawler threads record every request, retry and collected edge into one
+CrawlMetrics object. Its counters are protected by a lock so they can be updated
+from any number of threads. While a crawl is running, a MetricsReporter serves a
+JSON snapshot of the metrics on a local HTTP endpoint and flushes the same snapshot
+to a JSON file at a fixed interval, so worker counts and rate limits can be tuned
+while the crawl runs.
+
+Example:
+
+    $ curl http://localhost:8000/metrics
+"""
+
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the request latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Window used to compute the current pages per second
+RATE_WINDOW = 60.0
+
+
+class CrawlMetrics:
+    """Thread-safe counters for a crawl.
+
+    Attributes:
+        start_time: The time the metrics were created.
+        pages: The number of API pages requested successfully.
+        edges: The number of user relationships collected.
+        users: The number of users whose follows were fetched.
+        retries: The number of requests retried.
+        failures: The number of users that could not be processed.
+        status_codes: A Counter of HTTP status codes returned.
+        latency: A list of request counts per bucket of LATENCY_BUCKETS.
+        queue_depth: A dictionary of crawl level to the number of users queued.
+        level: The current crawl level.
+    """
+
+    def __init__(self):
+        """Inits CrawlMetrics with every counter at zero."""
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.pages = 0
+        self.edges = 0
+        self.users = 0
+        self.retries = 0
+        self.failures = 0
+        self.status_codes = Counter()
+        self.latency = [0] * len(LATENCY_BUCKETS)
+        self.latency_total = 0.0
+        self.queue_depth = {}
+        self.level = 0
+        self.recent_pages = deque()
+
+    def record_request(self, latency, status_code):
+        """Records one API request.
+
+        Args:
+            latency: The time the request took in seconds.
+            status_code: The HTTP status code of the response, or None if the
+                request raised before a response was received.
+        """
+        now = time.time()
+        bucket = next(i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound)
+        with self.lock:
+            self.status_codes[str(status_code)] += 1
+            self.latency[bucket] += 1
+            self.latency_total += latency
+            if status_code == 200:
+                self.pages += 1
+                self.recent_pages.append(now)
+            while self.recent_pages and self.recent_pages[0] < now - RATE_WINDOW:
+                self.recent_pages.popleft()
+
+    def record_edges(self, count):
+        """Adds to the number of user relationships collected."""
+        with self.lock:
+            self.edges += count
+
+    def record_user(self):
+        """Adds one to the number of users processed."""
+        with self.lock:
+            self.users += 1
+
+    def record_retry(self):
+        """Adds one to the number of retried requests."""
+        with self.lock:
+            self.retries += 1
+
+    def record_failure(self):
+        """Adds one to the number of users that could not be processed."""
+        with self.lock:
+            self.failures += 1
+
+    def set_level(self, level):
+        """Sets the current crawl level."""
+        with self.lock:
+            self.level = level
+
+    def set_queue_depth(self, depth, level=None):
+        """Sets the number of users queued at a level, the current level by default."""
+        with self.lock:
+            self.queue_depth[self.level if level is None else level] = depth
+
+    def snapshot(self):
+        """Returns the current metrics as a JSON serializable dictionary."""
+        now = time.time()
+        with self.lock:
+            elapsed = now - self.start_time
+            requests = sum(self.latency)
+            while self.recent_pages and self.recent_pages[0] < now - RATE_WINDOW:
+                self.recent_pages.popleft()
+            return {
+                'time': now,
+                'elapsed_seconds': elapsed,
+                'level': self.level,
+                'pages': self.pages,
+                'pages_per_second': len(self.recent_pages) / min(max(elapsed, 1e-9), RATE_WINDOW),
+                'pages_per_second_overall': self.pages / max(elapsed, 1e-9),
+                'edges': self.edges,
+                'users': self.users,
+                'retries': self.retries,
+                'failures': self.failures,
+                'status_codes': dict(self.status_codes),
+                'latency_histogram': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.latency)},
+                'latency_mean_seconds': self.latency_total / requests if requests else 0.0,
+                'queue_depth': {str(level): depth for level, depth in sorted(self.queue_depth.items())},
+            }
+
+
+class MetricsReporter:
+    """Publishes the snapshot of a CrawlMetrics object while a crawl runs.
+
+    Both the HTTP server and the file flusher run on daemon threads, and stop()
+    shuts them down and writes a final snapshot.
+
+    Attributes:
+        metrics: The CrawlMetrics object reported.
+        port: The local port of the HTTP endpoint, or None to not serve one.
+        path: The JSON file the snapshot is flushed to, or None to not write one.
+        interval: The number of seconds between flushes of the JSON file.
+    """
+
+    def __init__(self, metrics, port=8000, path='crawl_metrics.json', interval=10.0):
+        """Inits MetricsReporter without starting it."""
+        self.metrics = metrics
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.server = None
+        self.threads = []
+
+    def start(self):
+        """Starts the HTTP endpoint and the file flusher.
+
+        Returns:
+            The started MetricsReporter.
+        """
+        if self.port is not None:
+            self.server = ThreadingHTTPServer(('localhost', self.port), self.handler())
+            self.server.daemon_threads = True
+            self.threads.append(threading.Thread(target=self.server.serve_forever, daemon=True))
+        if self.path is not None:
+            self.threads.append(threading.Thread(target=self.flush_periodically, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stops the HTTP endpoint and the file flusher and writes a final snapshot."""
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        if self.path is not None:
+            self.flush()
+
+    def handler(self):
+        """Returns a request handler class serving the snapshot at /metrics."""
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def flush(self):
+        """Writes the current snapshot to the JSON file atomically."""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def flush_periodically(self):
+        """Flushes the JSON file every interval seconds until stopped."""
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
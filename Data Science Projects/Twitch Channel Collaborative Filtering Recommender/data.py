@@ -21,8 +21,9 @@ And user2 follows user3.
 import time
 import requests
 import threading
-from collections import deque
 import pickle
+from crawl_metrics import CrawlMetrics, MetricsReporter
+from crawl_frontier import Frontier, SeenFilter
 
 # Global API credentials
 
@@ -34,17 +35,26 @@ HEAD = { 'Client-ID': CLIENT_ID,
          'Authorization': AUTH
     }
 
-# Global stats variables for print_stats() function
+# Global crawl state and metrics
 
-LAST_TIME_CALLED = 0.0
-SLEEP_TIMES = deque()
 START_TIME = time.time()
-TOTAL_SLEEP_TIME = 0.0
 DONE = False
-LAST_EXECUTION = 0.0
 NUM_REMAINING_THREADS = 0.0
 TOTAL_THREADS = 0.0
 NOT_PROCESSED = []
+METRICS = CrawlMetrics()
+METRICS_PORT = 8000
+METRICS_PATH = 'crawl_metrics.json'
+
+# Number of most followed channels crawled at each level after the first
+LEVEL_BUDGETS = {1: 10000}
+
+# Number of most followed channels whose in-degree is kept between levels
+FRONTIER_CAPACITY = 100000
+
+# Requests with these status codes are retried up to MAX_RETRIES times
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
 
 
 class Consumer:
@@ -153,123 +163,131 @@ def fetch_page(user_id, user_pairs, param='from_id={}', pag_key=None):
         total: A variable set to zero to pass back to the get_user_follows()
             or get_follows_user() functions which will break out of those functions.
     """
-    global HEAD, URL, LAST_TIME_CALLED, NOT_PROCESSED
+    global HEAD, URL, NOT_PROCESSED
 
     url = URL + param + '&first=100'
 
     if pag_key:
         url = url + '&after=' + pag_key
     try:
-        LAST_TIME_CALLED = time.time()
-        r = requests.get(url=url.format(user_id), headers=HEAD)
+        r = request_page(url.format(user_id))
+        data = r.json()
 
-        if not r.json()['data']:
+        if not data['data']:
             return None, 0
 
-        for item in r.json()['data']:
+        for item in data['data']:
             user_pairs.append((item['from_id'], item['to_id']))
-        total = r.json()['total']
+        METRICS.record_edges(len(data['data']))
+        total = data['total']
         if total > 100 and len(user_pairs) < total:
-            pag_key = r.json()['pagination']['cursor']
+            pag_key = data['pagination']['cursor']
         else:
             pag_key = None
 
     except Exception as e:
-        LAST_TIME_CALLED = time.time()
         NOT_PROCESSED.append(user_id)
+        METRICS.record_failure()
         print('Unable to get followers for user_id={}, pag_key={}, exception={}'.format(user_id, pag_key, str(e)))
         pag_key, total = None, 0
 
     return pag_key, total
 
 
-def user_relationships(users, depth=1):
+def request_page(url):
+    """Requests a page from the Twitch API, retrying rate limited and server errors.
+
+    Every attempt is recorded in METRICS with its latency and status code.
+
+    Args:
+        url: The full URL of the page.
+
+    Returns:
+        The successful response.
+
+    Raises:
+        requests.RequestException: The request failed after MAX_RETRIES retries.
+    """
+    global HEAD
+    for attempt in range(MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            r = requests.get(url=url, headers=HEAD)
+        except requests.RequestException:
+            METRICS.record_request(time.perf_counter() - start, None)
+            if attempt == MAX_RETRIES:
+                raise
+        else:
+            METRICS.record_request(time.perf_counter() - start, r.status_code)
+            if r.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                r.raise_for_status()
+                return r
+        METRICS.record_retry()
+        time.sleep(2 ** attempt)
+
+
+def user_relationships(users, depth=1, budgets=LEVEL_BUDGETS, metrics_port=METRICS_PORT,
+                       metrics_path=METRICS_PATH):
     """Returns a list of user relationships.
 
     This function will output a list of users and which users they follow on Twitch.
+    Level 0 crawls the users passed in. Each level after that crawls the channels
+    followed by the users crawled so far that have not been crawled yet, most
+    followed first.
 
     Args:
         users: A generator object that yields tuples of users representing a follow relationship.
+        depth: The number of levels of followed channels to crawl.
+        budgets: A dictionary of level to the number of most followed channels to crawl
+            at that level. Levels missing from it crawl up to the FRONTIER_CAPACITY most
+            followed channels.
+        metrics_port: The local port serving live crawl metrics, or None to not serve them.
+        metrics_path: The JSON file crawl metrics are flushed to, or None to not write them.
     """
     global DONE, NUM_REMAINING_THREADS
 
-    def print_stats():
-        """Prints stats every 10 seconds while script is running.
-        """
-        nonlocal finished
-        while not finished:
-            try:
-                print('\nNumber processed = {} \n'
-                      'Number of candidates = {} \n'
-                      'Number of next candidates = {} \n'
-                      'Current Depth = {} \n'
-                      'Time elapsed = {} \n'
-                      'Time per candidate processed = {} \n'
-                      'Total not processed = {} \n'.format(len(seen), len(candidates), len(next_candidates), level,
-                                                           time.time() - START_TIME,
-                                                           (time.time() - START_TIME) / max(1, len(seen)),
-                                                           len(NOT_PROCESSED)))
-
-            except Exception:
-                pass
-
-            time.sleep(10.0)
-
-    def print_dots():
-        """Prints a line of dots to indicate script is running.
-        """
-        while not DONE:
-            print('.', end='')
-            time.sleep(1.0)
-
     if depth < 0:
         raise ValueError('Invalid input {}'.format(depth))
 
-    finished = False
     user_item = []
-    level = 0
-
-    candidates, next_candidates, seen = set(), set(), set()
-    start_collecting_stats(print_stats, print_dots)
-    next_candidates = set(*users)
+    seen = SeenFilter()
+    frontier = Frontier(FRONTIER_CAPACITY)
+    frontier.start_level(seen, budgets.get(0), [pair[0] for pairs in users for pair in pairs])
     consumers = [Consumer(i, []) for i in range(10)]
     consumer_cv = threading.Condition()
 
-    while next_candidates and level <= depth:
-        if level == 0:
-            start_threads(consumers, consumer_cv, next_candidates, seen)
-        level += 1
-        while NUM_REMAINING_THREADS > 0:
-            time.sleep(1.0)
+    with MetricsReporter(METRICS, metrics_port, metrics_path):
+        for level in range(depth + 1):
+            if not frontier:
+                break
+            METRICS.set_level(level)
+            METRICS.set_queue_depth(len(frontier))
+            if level == 0:
+                start_threads(consumers, consumer_cv, frontier, seen)
+            else:
+                with consumer_cv:
+                    NUM_REMAINING_THREADS = len(consumers) * 1.0
+                    consumer_cv.notify_all()
+            while NUM_REMAINING_THREADS > 0:
+                time.sleep(1.0)
+
+            for consumer in consumers:
+                user_item.extend(consumer.follows)
+                frontier.count(item[1] for item in consumer.follows)
+                consumer.follows = []
 
-        for consumer in consumers:
-            user_item.extend(consumer.follows)
-            next_candidates.update((item[1], None) for item in consumer.follows)
-            consumer.follows = []
+            if level < depth:
+                frontier.start_level(seen, budgets.get(level + 1))
 
-        # Save processed and next candidates periodically
-        if len(user_item) % 2500 == 0:
+            # Save processed and next candidates after each level
             with open('processed', 'wb') as processed:
-                pickle.dump(processed)
+                pickle.dump(user_item, processed)
             with open('next_candidates', 'wb') as next_candidates:
-                pickle.dump(next_candidates)
+                pickle.dump(frontier.queued(), next_candidates)
 
-        NUM_REMAINING_THREADS = len(consumers) * 1.0
-        consumer_cv.acquire()
-        consumer_cv.notifyAll()
-        consumer_cv.release()
-
-    finished = True
     return user_item
 
 
-def start_collecting_stats(print_stats, print_dots):
-    """Starts threads to print stats and dots while user_relationships() function is executing.
-    """
-    threading.Thread(target=print_dots).start()
-    threading.Thread(target=print_stats).start()
-
-
 def consumer_thread(consumer_cv, queue, consumer, seen):
     """The job of each consumer thread.
 
@@ -281,9 +299,9 @@ def consumer_thread(consumer_cv, queue, consumer, seen):
 
     Args:
         consumer_cv: A threading Condition object
-        queue: A set of user relationships as tuples.
+        queue: A Frontier of user IDs to process.
         consumer: The id of the consumer thread worker.
-        seen: A set of users already processed.
+        seen: A SeenFilter of users already processed.
     """
     global NUM_REMAINING_THREADS, TOTAL_THREADS
     user_id = None
@@ -298,9 +316,11 @@ def consumer_thread(consumer_cv, queue, consumer, seen):
                 user_id = None
             else:
                 seen.add(user_id)
+        METRICS.set_queue_depth(len(queue))
         consumer_cv.release()
         if user_id:
-            for new_follows in get_user_follows(user_id[0]):
+            METRICS.record_user()
+            for new_follows in get_user_follows(user_id):
                 time.sleep(NUM_REMAINING_THREADS / TOTAL_THREADS)
                 if isinstance(new_follows, list):
                     consumer.follows.extend(new_follows)
@@ -317,14 +337,14 @@ def start_threads(consumers, consumer_cv, queue, seen):
     Args:
         consumers: A list of Consumers.
         consumer_cv: A threading Condition object.
-        queue: A set of user relationships as tuples.
-        seen: A set of users already processed.
+        queue: A Frontier of user IDs to process.
+        seen: A SeenFilter of users already processed.
     """
     global NUM_REMAINING_THREADS, TOTAL_THREADS
     NUM_REMAINING_THREADS = 1.0 * len(consumers)
     TOTAL_THREADS = 1.0 * len(consumers)
     for consumer in consumers:
-        threading.Thread(target=consumer_thread, args=[consumer_cv, queue, consumer, seen]).start()
+        threading.Thread(target=consumer_thread, args=[consumer_cv, queue, consumer, seen], daemon=True).start()
 
 
 def main():
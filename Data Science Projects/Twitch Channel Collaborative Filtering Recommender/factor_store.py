@@ -0,0 +1,289 @@
+"""Exports the factors of a trained RankFM model to a quantized, memory-mapped store.
+
+A store is a directory holding the user factors, item factors and item biases as
+.npy files, quantized to float16 or to int8 with a float32 scale for every row,
+plus a meta.json file describing them and an ids.json sidecar mapping user and
+item IDs to rows. Item features are folded into the item factors and biases when
+the store is exported, so scoring only needs the three matrices.
+
+The store path is a symlink to a versioned directory next to it. A re-export
+writes a new version and swaps the symlink with an atomic rename, so the path
+always opens a complete store. The previous version is kept for readers still
+opening it and older versions are removed.
+
+FactorStore opens the .npy files with memory mapping, so loading is instant and
+every serving process on a host shares the same pages of the files instead of
+holding its own copy of the factors.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+STORE_VERSION = 1
+
+# Number of items scored at once, so int8 factors are never dequantized all at once
+CHUNK_ITEMS = 65536
+
+
+def factor_matrices(model):
+    """Returns the full precision factors of a trained RankFM model.
+
+    Item and user features are folded in, so the score of user u for item i is
+    item_bias[i] + user_factors[u] @ item_factors[i], the same as RankFM.predict().
+
+    Args:
+        model: A fitted RankFM model.
+
+    Returns:
+        A dictionary of float32 arrays user_factors, item_factors and item_bias and
+        lists user_ids and item_ids in row order.
+    """
+    user_factors = np.asarray(model.v_u, dtype=np.float32)
+    item_factors = np.asarray(model.v_i, dtype=np.float32)
+    item_bias = np.asarray(model.w_i, dtype=np.float32)
+
+    if getattr(model, 'x_uf', None) is not None and np.size(model.x_uf):
+        user_factors = user_factors + np.asarray(model.x_uf @ model.v_uf, dtype=np.float32)
+    if getattr(model, 'x_if', None) is not None and np.size(model.x_if):
+        item_factors = item_factors + np.asarray(model.x_if @ model.v_if, dtype=np.float32)
+        item_bias = item_bias + np.asarray(model.x_if @ model.w_if, dtype=np.float32)
+
+    return {'user_factors': user_factors,
+            'item_factors': item_factors,
+            'item_bias': item_bias,
+            'user_ids': [str(user) for user in model.index_to_user.values],
+            'item_ids': [str(item) for item in model.index_to_item.values]}
+
+
+def quantize(x, dtype):
+    """Quantizes a 2D array.
+
+    Args:
+        x: A float32 array.
+        dtype: 'float16' or 'int8'. int8 uses a symmetric scale for every row.
+
+    Returns:
+        The quantized array and the float32 scale of every row, or None for float16.
+
+    Raises:
+        ValueError: The dtype is not 'float16' or 'int8'.
+    """
+    if dtype == 'float16':
+        return x.astype(np.float16), None
+    if dtype != 'int8':
+        raise ValueError('Invalid dtype {}'.format(dtype))
+    scale = np.abs(x).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    return np.round(x / scale[:, None]).astype(np.int8), scale.astype(np.float32)
+
+
+def export_factors(model, path, dtype='int8', sample_users=1000, n_items=10):
+    """Writes the factors of a trained model to a store and reports the accuracy lost.
+
+    Args:
+        model: A fitted RankFM model.
+        path: The store path, which becomes a symlink to the new version directory.
+        dtype: 'float16' or 'int8'.
+        sample_users: The number of users to measure the accuracy loss on.
+        n_items: The number of top items compared in the accuracy report.
+
+    Returns:
+        The accuracy report from accuracy_report().
+    """
+    full = factor_matrices(model)
+
+    # Build the store in a new version directory, so a re-export never truncates
+    # files that serving processes have memory-mapped
+    path = path.rstrip(os.sep)
+    prefix = os.path.basename(path) + '.v'
+    version = tempfile.mkdtemp(prefix=prefix, dir=os.path.dirname(path) or '.')
+    os.chmod(version, 0o755)
+
+    arrays = {'item_bias': full['item_bias']}
+    for name in ('user_factors', 'item_factors'):
+        arrays[name], scale = quantize(full[name], dtype)
+        if scale is not None:
+            arrays[name.replace('factors', 'scale')] = scale
+    for name, array in arrays.items():
+        np.save(os.path.join(version, name + '.npy'), array)
+
+    with open(os.path.join(version, 'ids.json'), 'w') as f:
+        json.dump({'users': full['user_ids'], 'items': full['item_ids']}, f)
+
+    meta = {'version': STORE_VERSION,
+            'dtype': dtype,
+            'factors': int(full['user_factors'].shape[1]),
+            'users': len(full['user_ids']),
+            'items': len(full['item_ids'])}
+    with open(os.path.join(version, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    meta['accuracy'] = report = accuracy_report(full, FactorStore(version), sample_users, n_items)
+    with open(os.path.join(version, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    swap_version(path, version)
+    return report
+
+
+def swap_version(path, version):
+    """Points the store path at a version directory and removes older versions.
+
+    The symlink is renamed over the path, which is atomic, so readers see either
+    the old or the new store. A store written as a plain directory by an earlier
+    export is moved to a version directory first.
+
+    Args:
+        path: The store path.
+        version: The new version directory, next to path.
+    """
+    parent = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path) + '.v'
+    previous = None
+    if os.path.islink(path):
+        previous = os.path.basename(os.readlink(path))
+    elif os.path.isdir(path):
+        previous = os.path.basename(tempfile.mkdtemp(prefix=prefix, dir=parent))
+        os.replace(path, os.path.join(parent, previous))
+
+    link = path + '.tmp'
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    # Keep the previous version for readers that resolved the path before the swap
+    keep = {os.path.basename(version), previous}
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and name not in keep and os.path.isdir(os.path.join(parent, name)):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+class FactorStore:
+    """Read-only, memory-mapped store of quantized RankFM factors.
+
+    Attributes:
+        dtype: The quantized dtype, 'float16' or 'int8'.
+        user_factors, item_factors: The memory-mapped quantized factors.
+        user_scale, item_scale: The memory-mapped int8 scale of every row, or None.
+        item_bias: The memory-mapped float32 item biases.
+        user_ids, item_ids: Lists of the user and item IDs in row order.
+        user_rows, item_rows: Dictionaries mapping IDs to rows.
+        meta: The contents of meta.json.
+    """
+
+    def __init__(self, path):
+        """Opens a store written by export_factors().
+
+        Args:
+            path: The directory of the store.
+
+        Raises:
+            ValueError: The store was written by a different STORE_VERSION.
+        """
+        # Resolve the symlink once, so every file comes from the same version
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError('Factor store version {} is not {}'.format(self.meta['version'], STORE_VERSION))
+        self.dtype = self.meta['dtype']
+
+        def load(name):
+            return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+        self.user_factors, self.item_factors = load('user_factors'), load('item_factors')
+        self.item_bias = load('item_bias')
+        if self.dtype == 'int8':
+            self.user_scale, self.item_scale = load('user_scale'), load('item_scale')
+        else:
+            self.user_scale, self.item_scale = None, None
+
+        with open(os.path.join(path, 'ids.json')) as f:
+            ids = json.load(f)
+        self.user_ids, self.item_ids = ids['users'], ids['items']
+        self.user_rows = {user: i for i, user in enumerate(self.user_ids)}
+        self.item_rows = {item: i for i, item in enumerate(self.item_ids)}
+
+    def user_vector(self, user_id):
+        """Returns the dequantized float32 factors of a user.
+
+        Raises:
+            KeyError: The user is not in the store.
+        """
+        row = self.user_rows[str(user_id)]
+        vector = self.user_factors[row].astype(np.float32)
+        return vector * self.user_scale[row] if self.user_scale is not None else vector
+
+    def scores(self, user_id):
+        """Returns the score of every item for a user.
+
+        Raises:
+            KeyError: The user is not in the store.
+        """
+        vector = self.user_vector(user_id)
+        scores = np.empty(len(self.item_ids), dtype=np.float32)
+        for start in range(0, len(scores), CHUNK_ITEMS):
+            block = self.item_factors[start:start + CHUNK_ITEMS].astype(np.float32) @ vector
+            if self.item_scale is not None:
+                block *= self.item_scale[start:start + CHUNK_ITEMS]
+            scores[start:start + CHUNK_ITEMS] = block
+        return scores + self.item_bias
+
+    def recommend(self, user_id, n_items=10, exclude=()):
+        """Returns the IDs of the highest scoring items for a user.
+
+        Args:
+            user_id: The ID of a user in the store.
+            n_items: The number of items to return.
+            exclude: Item IDs to leave out, such as channels the user already follows.
+
+        Raises:
+            KeyError: The user is not in the store.
+        """
+        scores = self.scores(user_id)
+        rows = [self.item_rows[item] for item in map(str, exclude) if item in self.item_rows]
+        scores[rows] = -np.inf
+        n_items = min(n_items, len(scores))
+        top = np.argpartition(-scores, n_items - 1)[:n_items]
+        return [self.item_ids[i] for i in top[np.argsort(-scores[top])]]
+
+
+def accuracy_report(full, store, sample_users=1000, n_items=10, seed=0):
+    """Compares quantized scores from a store against full precision scores.
+
+    Args:
+        full: The dictionary returned by factor_matrices().
+        store: A FactorStore of the same model.
+        sample_users: The number of random users compared.
+        n_items: The number of top items compared.
+        seed: The random seed used to pick the users.
+
+    Returns:
+        A dictionary with the largest and mean absolute score error and the mean
+        share of each user's full precision top n_items also in the quantized top n_items.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = len(full['user_ids'])
+    users = rng.choice(n_users, min(sample_users, n_users), replace=False)
+    n_items = min(n_items, len(full['item_ids']))
+
+    max_error, total_error, overlap = 0.0, 0.0, 0.0
+    for row in users:
+        expected = full['item_bias'] + full['item_factors'] @ full['user_factors'][row]
+        actual = store.scores(full['user_ids'][row])
+        error = np.abs(actual - expected)
+        max_error = max(max_error, float(error.max()))
+        total_error += float(error.mean())
+        top_expected = np.argpartition(-expected, n_items - 1)[:n_items]
+        top_actual = np.argpartition(-actual, n_items - 1)[:n_items]
+        overlap += len(np.intersect1d(top_expected, top_actual)) / n_items
+
+    return {'dtype': store.dtype,
+            'users': len(users),
+            'max_abs_error': max_error,
+            'mean_abs_error': total_error / max(len(users), 1),
+            'top_k_overlap': overlap / max(len(users), 1)}
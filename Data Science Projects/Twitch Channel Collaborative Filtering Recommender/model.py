@@ -5,12 +5,14 @@ The model is a Factorization Machine built with the package RankFM.
 
 from rankfm.rankfm import RankFM
 from features import user_item_interactions
+from factor_store import export_factors
 from interactions import HEAD
 import pickle
 import requests
 from pprint import pprint
 
 URL = 'https://api.twitch.tv/helix'
+FACTOR_STORE_PATH = 'factor_store'
 
 
 def item_features_matrix(file):
@@ -80,6 +82,7 @@ def main(users):
     interactions = user_item_interactions('user_item_interactions.pkl')
     item_features = item_features_matrix('item_features.pkl')
     recommender = model(interactions, item_features, 30, 30, 30)
+    pprint(export_factors(recommender, FACTOR_STORE_PATH))
     recs = give_recommendations(recommender, users, n_items=10)
     for rec in list(recs.values[0]):
         pprint(get_channel_info(rec))